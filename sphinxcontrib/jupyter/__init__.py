@@ -11,6 +11,7 @@ from .directive.jupyter import jupyter_node
 from .directive.jupyter import Jupyter as JupyterDirective
 from .directive.jupyter import JupyterDependency
 from .transform import JupyterOnlyTransform
+from .collector import JupyterNodeIndexCollector
 
 import pkg_resources
 VERSION = pkg_resources.get_distribution('pip').version
@@ -63,9 +64,27 @@ def setup(app):
     app.add_config_value("jupyter_dependency_lists", {}, "jupyter")
     app.add_config_value("jupyter_threads_per_worker", 1, "jupyter")
     app.add_config_value("jupyter_number_workers", 1, "jupyter")
+    app.add_config_value("jupyter_execute_fail_fast", None, "jupyter")
+    app.add_config_value("jupyter_execute_sample", None, "jupyter")
+    app.add_config_value("jupyter_execute_retries", 0, "jupyter")
+    app.add_config_value("jupyter_execute_retry_backoff", 1.0, "jupyter")
+    app.add_config_value("jupyter_execute_memory_limit", None, "jupyter")
+    app.add_config_value("jupyter_execute_memory_budget", None, "jupyter")
+    app.add_config_value("jupyter_execute_progress_interval", None, "jupyter")
     app.add_config_value("jupyter_make_coverage", False, "jupyter")
     app.add_config_value("jupyter_target_pdf", False, "jupyter")
     app.add_config_value("jupyter_coverage_dir", None, "jupyter")
+    app.add_config_value("jupyter_coverage_reuse_notebooks", False, "jupyter")
+    app.add_config_value("jupyter_coverage_max_tracebacks", 10, "jupyter")
+    app.add_config_value("jupyter_coverage_history_window", 10, "jupyter")
+    app.add_config_value("jupyter_coverage_regression_threshold", 0.25, "jupyter")
+    app.add_config_value("jupyter_coverage_regression_min_seconds", 1.0, "jupyter")
+    app.add_config_value("jupyter_cell_profile_top", 20, "jupyter")
+    app.add_config_value("jupyter_build_telemetry", False, "jupyter")
+    app.add_config_value("jupyter_max_stream_output_bytes", None, "jupyter")
+    app.add_config_value("jupyter_max_outputs_per_cell", None, "jupyter")
+    app.add_config_value("jupyter_max_image_output_bytes", None, "jupyter")
+    app.add_config_value("jupyter_extract_output_images", False, "jupyter")
     app.add_config_value("jupyter_theme", None, "jupyter")
     app.add_config_value("jupyter_theme_path", "theme", "jupyter")
     app.add_config_value("jupyter_template_path", "templates", "jupyter")
@@ -110,9 +129,11 @@ def setup(app):
         app.add_directive('exerciselist', exercise.ExerciselistDirective)
         app.connect('doctree-resolved', exercise.process_exercise_nodes)
         app.connect('env-purge-doc', exercise.purge_exercises)
+        app.connect('env-merge-info', exercise.merge_exercises)
 
     # jupyter setup
     app.add_transform(JupyterOnlyTransform)
+    app.add_env_collector(JupyterNodeIndexCollector)
     app.add_config_value("jupyter_allow_html_only", False, "jupyter")
     app.add_config_value("jupyter_target_html", False, "jupyter")
     app.add_config_value("jupyter_download_nb", False, "jupyter")
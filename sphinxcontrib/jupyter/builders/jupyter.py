@@ -12,11 +12,13 @@ from sphinx.util.fileutil import copy_asset
 from ..writers.execute_nb import ExecuteNotebookWriter
 from ..writers.make_site import MakeSiteWriter
 from ..writers.convert import convertToHtmlWriter
+from ..writers.parallel_write import ParallelWriter
 from dask.distributed import Client, progress
 from sphinx.util import logging
 import pdb
 import time
 from ..writers.utils import copy_dependencies
+from ..writers.telemetry import BuildTelemetry
 
 class JupyterBuilder(Builder):
     """
@@ -37,6 +39,9 @@ class JupyterBuilder(Builder):
     logger = logging.getLogger(__name__)
 
     def init(self):
+        self.telemetry = BuildTelemetry(self.config["jupyter_build_telemetry"])
+        self.current_docname = None
+
         ### initializing required classes
         self._execute_notebook_class = ExecuteNotebookWriter(self)
         self._make_site_class = MakeSiteWriter(self)
@@ -47,6 +52,8 @@ class JupyterBuilder(Builder):
         self.downloadsExecutedir = self.downloadsdir + "/executed"
         self.client = None
         self.execution_status_code = 0
+        ## identifies the results of this build in the execution results store
+        self.build_id = "{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid())
 
         # Check default language is defined in the jupyter kernels
         def_lng = self.config["jupyter_default_lang"]
@@ -86,11 +93,12 @@ class JupyterBuilder(Builder):
             self.client = Client(processes=False, threads_per_worker = self.threads_per_worker, n_workers = self.n_workers)
             self.execution_vars = {
                 'target': 'website',
-                'dependency_lists': self.config["jupyter_dependency_lists"],
+                'dependency_lists': dict(self.config["jupyter_dependency_lists"]),
                 'executed_notebooks': [],
                 'delayed_notebooks': dict(),
                 'futures': [],
                 'delayed_futures': [],
+                'held_notebooks': [],
                 'destination': self.executedir
             }
 
@@ -99,14 +107,19 @@ class JupyterBuilder(Builder):
                 self.client = Client(processes=False, threads_per_worker = self.threads_per_worker, n_workers = self.n_workers)
             self.download_execution_vars = {
                 'target': 'downloads',
-                'dependency_lists': self.config["jupyter_dependency_lists"],
+                'dependency_lists': dict(self.config["jupyter_dependency_lists"]),
                 'executed_notebooks': [],
                 'delayed_notebooks': dict(),
                 'futures': [],
                 'delayed_futures': [],
+                'held_notebooks': [],
                 'destination': self.downloadsExecutedir
             }
 
+        if self.config["jupyter_execute_notebooks"] and self.config["jupyter_download_nb_execute"]:
+            ## the download and website notebooks of a document are executed once
+            self._execute_notebook_class.shared_executions = dict()
+
     def get_outdated_docs(self):
         for docname in self.env.found_docs:
             if docname not in self.env.all_docs:
@@ -131,21 +144,48 @@ class JupyterBuilder(Builder):
     def prepare_writing(self, docnames):
         self.writer = self._writer_class(self)
 
-        ## copies the dependencies to the notebook folder
-        copy_dependencies(self)
+        with self.telemetry.stage("copy_dependencies"):
+            ## copies the dependencies to the notebook folder
+            copy_dependencies(self)
 
-        if (self.config["jupyter_execute_notebooks"]):
-             ## copies the dependencies to the executed folder
-            copy_dependencies(self, self.executedir)
+            if (self.config["jupyter_execute_notebooks"]):
+                 ## copies the dependencies to the executed folder
+                copy_dependencies(self, self.executedir)
 
-        if (self.config["jupyter_download_nb_execute"]):
-            copy_dependencies(self, self.downloadsExecutedir)
+            if (self.config["jupyter_download_nb_execute"]):
+                copy_dependencies(self, self.downloadsExecutedir)
+
+    def _write_parallel(self, docnames, nproc):
+        ## notebooks are written by the workers and executed by this process
+        ParallelWriter(self).write_parallel(self, docnames, nproc)
 
     def write_doc(self, docname, doctree):
+        for request in self.translate_notebooks(docname, doctree):
+            self.submit_execution(*request)
+
+    def submit_execution(self, target, docname, nb):
+        """Executes the notebook of docname for target (website or downloads)"""
+        if target == 'downloads':
+            params = self.download_execution_vars
+        else:
+            params = self.execution_vars
+        strDocname = str(docname)
+        if strDocname in params['dependency_lists'].keys():
+            params['delayed_notebooks'].update({strDocname: nb})
+        else:
+            self._execute_notebook_class.execute_notebook(self, nb, docname, params, params['futures'])
+
+    def translate_notebooks(self, docname, doctree):
+        """
+        Writes the notebooks of docname and returns the (target, docname, notebook)
+        requests to execute them, which are submitted by the main process
+        """
+        requests = []
         # work around multiple string % tuple issues in docutils;
         # replace tuples in attribute values with lists
         doctree = doctree.deepcopy()
         destination = docutils.io.StringOutput(encoding="utf-8")
+        self.current_docname = docname
         ### print an output for downloading notebooks as well with proper links if variable is set
         if "jupyter_download_nb" in self.config and self.config["jupyter_download_nb"]:
 
@@ -156,10 +196,11 @@ class JupyterBuilder(Builder):
             self.writer.write(doctree, destination)
 
             # get a NotebookNode object from a string
-            nb = nbformat.reads(self.writer.output, as_version=4)
+            with self.telemetry.stage("serialize", docname):
+                nb = nbformat.reads(self.writer.output, as_version=4)
             nb = self.update_Metadata(docname, nb)
             try:
-                with codecs.open(outfilename, "w", "utf-8") as f:
+                with self.telemetry.stage("serialize", docname), codecs.open(outfilename, "w", "utf-8") as f:
                     self.writer.output = nbformat.writes(nb, version=4)
                     f.write(self.writer.output)
             except (IOError, OSError) as err:
@@ -167,11 +208,7 @@ class JupyterBuilder(Builder):
 
             ### executing downloaded notebooks
             if (self.config['jupyter_download_nb_execute']):
-                strDocname = str(docname)
-                if strDocname in self.download_execution_vars['dependency_lists'].keys():
-                    self.download_execution_vars['delayed_notebooks'].update({strDocname: nb})
-                else:
-                    self._execute_notebook_class.execute_notebook(self, nb, docname, self.download_execution_vars, self.download_execution_vars['futures'])
+                requests.append(('downloads', docname, nb))
 
         ### output notebooks for executing
         self.writer._set_ref_urlpath(None)
@@ -179,34 +216,35 @@ class JupyterBuilder(Builder):
         self.writer.write(doctree, destination)
 
         # get a NotebookNode object from a string
-        nb = nbformat.reads(self.writer.output, as_version=4)
+        with self.telemetry.stage("serialize", docname):
+            nb = nbformat.reads(self.writer.output, as_version=4)
         nb = self.update_Metadata(docname, nb)
 
         ### execute the notebook
         if (self.config["jupyter_execute_notebooks"]):
-            strDocname = str(docname)
-            if strDocname in self.execution_vars['dependency_lists'].keys():
-                self.execution_vars['delayed_notebooks'].update({strDocname: nb})
-            else:
-                self._execute_notebook_class.execute_notebook(self, nb, docname, self.execution_vars, self.execution_vars['futures'])
+            nb = self._execute_notebook_class.add_execution_metadata(self, nb, docname)
+            requests.append(('website', docname, nb))
         else:
             #do not execute
             if (self.config['jupyter_generate_html']):
                 language_info = nb.metadata.kernelspec.language
                 self._convert_class = convertToHtmlWriter(self)
-                self._convert_class.convert(nb, docname, language_info, self.outdir)
+                with self.telemetry.stage("convert_html", docname):
+                    self._convert_class.convert(nb, docname, language_info, self.outdir)
 
         ### mkdir if the directory does not exist
         outfilename = os.path.join(self.outdir, os_path(docname) + self.out_suffix)
         ensuredir(os.path.dirname(outfilename))
 
         try:
-            with codecs.open(outfilename, "w", "utf-8") as f:
+            with self.telemetry.stage("serialize", docname), codecs.open(outfilename, "w", "utf-8") as f:
                 self.writer.output = nbformat.writes(nb, version=4)
                 f.write(self.writer.output)
         except (IOError, OSError) as err:
             self.logger.warning("error writing file %s: %s" % (outfilename, err))
 
+        return requests
+
     def update_Metadata(self, docname, nb):
         """Update Metadata for Jupyter Notebook"""
         if "jupyter_make_site" in self.config and self.config['jupyter_make_site']:
@@ -299,15 +337,19 @@ class JupyterBuilder(Builder):
             self.save_executed_and_generate_coverage(self.download_execution_vars, 'downloads')
 
         if "jupyter_make_site" in self.config and self.config['jupyter_make_site']:
-            self._make_site_class.build_website(self)
+            with self.telemetry.stage("make_site"):
+                self._make_site_class.build_website(self)
 
+        self.telemetry.write(self.reportdir)
         exit(self.execution_status_code)
 
     def save_executed_and_generate_coverage(self, params, target, coverage = False):
 
-            # watch progress of the execution of futures
+            # watch progress of the execution of futures (see jupyter_execute_progress_interval)
             self.logger.info(bold("Starting notebook execution for %s and html conversion(if set in config)..."), target)
-            #progress(self.futures)
+
+            ## the failures of each target are counted separately
+            self._execute_notebook_class.fail_fast.reset()
 
             # save executed notebook
             error_results = self._execute_notebook_class.save_executed_notebook(self, params)
@@ -317,7 +359,13 @@ class JupyterBuilder(Builder):
                 ## produces a JSON file of dask execution
                 self._execute_notebook_class.produce_dask_processing_report(self, params)
 
+                ## generate the JSON and HTML cell profile reports
+                self._execute_notebook_class.produce_cell_profile_report(self, error_results, params)
+
                 ## generate the JSON code execution reports file
                 error_results  = self._execute_notebook_class.produce_code_execution_report(self, error_results, params)
 
+                ## flag runtime regressions, new failures and flaky notebooks against the previous builds
+                self._execute_notebook_class.produce_execution_trends_report(self, error_results, params)
+
                 self._execute_notebook_class.create_coverage_report(self, error_results, params)
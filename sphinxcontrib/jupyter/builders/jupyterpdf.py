@@ -12,11 +12,13 @@ from sphinx.util.fileutil import copy_asset
 from dask.distributed import Client, progress
 from ..writers.execute_nb import ExecuteNotebookWriter
 from ..writers.make_pdf import MakePDFWriter
+from ..writers.parallel_write import ParallelWriter
 from sphinx.util import logging
 import pdb
 import shutil
 from distutils.spawn import find_executable
 import time
+from ..writers.telemetry import BuildTelemetry
 
 class JupyterPDFBuilder(Builder):
     """
@@ -48,6 +50,9 @@ class JupyterPDFBuilder(Builder):
                 "You have switched on the book conversion option but not specified an index/contents file for book pdf"
             )
             exit(1)
+        self.telemetry = BuildTelemetry(self.config["jupyter_build_telemetry"])
+        self.current_docname = None
+
         ### initializing required classes
         self._execute_notebook_class = ExecuteNotebookWriter(self)
         self._pdf_class = MakePDFWriter(self)
@@ -104,11 +109,12 @@ class JupyterPDFBuilder(Builder):
         self.client = Client(processes=False, threads_per_worker = self.threads_per_worker, n_workers = self.n_workers)
         self.execution_vars = {
             'target': 'website',
-            'dependency_lists': self.config["jupyter_dependency_lists"],
+            'dependency_lists': dict(self.config["jupyter_dependency_lists"]),
             'executed_notebooks': [],
             'delayed_notebooks': dict(),
             'futures': [],
             'delayed_futures': [],
+            'held_notebooks': [],
             'destination': self.executedir
         }
 
@@ -136,11 +142,32 @@ class JupyterPDFBuilder(Builder):
     def prepare_writing(self, docnames):
         self.writer = self._writer_class(self)
 
+    def _write_parallel(self, docnames, nproc):
+        ## notebooks are written by the workers and executed by this process
+        ParallelWriter(self).write_parallel(self, docnames, nproc)
+
     def write_doc(self, docname, doctree):
+        for request in self.translate_notebooks(docname, doctree):
+            self.submit_execution(*request)
+
+    def submit_execution(self, target, docname, nb):
+        """Executes the notebook of docname"""
+        strDocname = str(docname)
+        if strDocname in self.execution_vars['dependency_lists'].keys():
+            self.execution_vars['delayed_notebooks'].update({strDocname: nb})
+        else:
+            self._execute_notebook_class.execute_notebook(self, nb, docname, self.execution_vars, self.execution_vars['futures'])
+
+    def translate_notebooks(self, docname, doctree):
+        """
+        Writes the notebook of docname and returns the (target, docname, notebook)
+        request to execute it, which is submitted by the main process
+        """
         # work around multiple string % tuple issues in docutils;
         # replace tuples in attribute values with lists
         doctree = doctree.deepcopy()
         destination = docutils.io.StringOutput(encoding="utf-8")
+        self.current_docname = docname
 
         ### output notebooks for executing for single pdfs, the urlpath should be set to website url
         self.writer._set_ref_urlpath(self.config["jupyter_pdf_urlpath"])
@@ -148,27 +175,25 @@ class JupyterPDFBuilder(Builder):
         self.writer.write(doctree, destination)
 
         # get a NotebookNode object from a string
-        nb = nbformat.reads(self.writer.output, as_version=4)
+        with self.telemetry.stage("serialize", docname):
+            nb = nbformat.reads(self.writer.output, as_version=4)
         nb = self.update_Metadata(nb)
-
-        ### execute the notebook - keep it forcefully on
-        strDocname = str(docname)
-        if strDocname in self.execution_vars['dependency_lists'].keys():
-            self.execution_vars['delayed_notebooks'].update({strDocname: nb})
-        else:        
-            self._execute_notebook_class.execute_notebook(self, nb, docname, self.execution_vars, self.execution_vars['futures'])
+        nb = self._execute_notebook_class.add_execution_metadata(self, nb, docname)
 
         ### mkdir if the directory does not exist
         outfilename = os.path.join(self.outdir, os_path(docname) + self.out_suffix)
         ensuredir(os.path.dirname(outfilename))
 
         try:
-            with codecs.open(outfilename, "w", "utf-8") as f:
+            with self.telemetry.stage("serialize", docname), codecs.open(outfilename, "w", "utf-8") as f:
                 self.writer.output = nbformat.writes(nb, version=4)
                 f.write(self.writer.output)
         except (IOError, OSError) as err:
             self.logger.warning("error writing file %s: %s" % (outfilename, err))
 
+        ### execute the notebook - keep it forcefully on
+        return [('website', docname, nb)]
+
     def update_Metadata(self, nb):
         nb.metadata.date = time.time()
         return nb
@@ -231,3 +256,5 @@ class JupyterPDFBuilder(Builder):
         if "jupyter_target_pdf" in self.config and self.config["jupyter_target_pdf"] and self.config["jupyter_pdf_book"]:
             self._pdf_class.process_tex_for_book(self)
 
+        self.telemetry.write(self.reportdir)
+
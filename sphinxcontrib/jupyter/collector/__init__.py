@@ -0,0 +1,83 @@
+"""
+Index of the nodes of each document that later stages of the build look for
+"""
+
+from sphinx.environment.collectors import EnvironmentCollector
+from ..directive.exercise import exercise_node, exerciselist_node
+
+
+def new_node_index():
+    return {
+        'exercises': [],
+        'exercise_lists': [],
+    }
+
+
+def get_node_index(env, docname):
+    """
+    Returns the node index of `docname`, or None if the document has not been indexed
+    (e.g. an environment pickled by an earlier version), in which case callers should
+    traverse the doctree instead.
+    """
+    return getattr(env, 'jupyter_node_index', {}).get(docname)
+
+
+def node_index_for_update(env, docname):
+    ## returns the node index of docname, creating it while the document is read
+    if not hasattr(env, 'jupyter_node_index'):
+        env.jupyter_node_index = {}
+    if docname not in env.jupyter_node_index:
+        env.jupyter_node_index[docname] = new_node_index()
+    return env.jupyter_node_index[docname]
+
+
+class JupyterNodeIndexCollector(EnvironmentCollector):
+    """
+    Records, while each document is read, the position (line and order in the document)
+    and attributes of its exercises and exercise lists in ``env.jupyter_node_index[docname]``,
+    so `process_exercise_nodes` only traverses the documents which have some.
+
+    The index is cleared with the document and merged back from parallel readers, so it
+    is valid for every document of the environment.
+
+    Code blocks, ``only`` nodes and jupyter-dependency files are not indexed, since no
+    pass could skip work with them. The ``only`` nodes are removed by JupyterOnlyTransform
+    while the document is read, before it is collected. The code mode translator walks
+    the resolved doctree, which includes the exercises copied from other documents. The
+    dependency files are collected by the translator while it visits the document.
+    """
+
+    indexed_nodes = (exercise_node, exerciselist_node)
+
+    def clear_doc(self, app, env, docname):
+        if hasattr(env, 'jupyter_node_index'):
+            env.jupyter_node_index.pop(docname, None)
+
+    def merge_other(self, app, env, docnames, other):
+        for docname in docnames:
+            index = get_node_index(other, docname)
+            if index is not None:
+                node_index_for_update(env, docname).update(index)
+
+    def process_doc(self, app, doctree):
+        index = node_index_for_update(app.env, app.env.docname)
+        index.update(new_node_index())
+
+        for position, node in enumerate(doctree.findall(self.is_indexed)):
+            if isinstance(node, exercise_node):
+                index['exercises'].append({
+                    'position': position,
+                    'line': node.line,
+                    'id': node['_id'],
+                    'label': node['label'],
+                })
+            else:
+                index['exercise_lists'].append({
+                    'position': position,
+                    'line': node.line,
+                    'id': node['_id'],
+                })
+
+    @classmethod
+    def is_indexed(cls, node):
+        return isinstance(node, cls.indexed_nodes)
@@ -7,6 +7,165 @@ from sphinx.util.docutils import SphinxDirective
 
 RE_EXERCISE_NUM = re.compile(r"^Exercise \d+$")
 
+# builders resolving the doctree of each document on its own, other builders (latex,
+# singlehtml, ...) resolve documents assembled into a single doctree
+PER_DOCUMENT_BUILDERS = ("jupyter", "jupyterpdf", "html", "dirhtml")
+
+# indices of the exercises (lists of ids) kept in the env
+EXERCISE_INDICES = {
+    "exercise_index_by_label": lambda info: info["label"],
+    "exercise_index_by_docname": lambda info: info["docname"],
+    "exercise_index_by_section": lambda info: exercise_section(info["docname"]),
+}
+
+
+def exercise_section(docname):
+    """
+    Returns the section (directory) of `docname`, an empty string for top level documents
+    """
+    return docname.rsplit("/", 1)[0] if "/" in docname else ""
+
+
+def index_exercise(env, node_id, info):
+    for attr, key in EXERCISE_INDICES.items():
+        if not hasattr(env, attr):
+            setattr(env, attr, dict())
+        getattr(env, attr).setdefault(key(info), []).append(node_id)
+
+
+def index_exercise_list(env, node_id, info):
+    if not hasattr(env, "exercise_list_index_by_docname"):
+        env.exercise_list_index_by_docname = dict()
+    env.exercise_list_index_by_docname.setdefault(info["docname"], []).append(node_id)
+
+
+def ensure_exercise_indices(env):
+    ## indexes the exercises of an environment pickled before the indices were kept, creating
+    ## the indices even when its registries are empty
+    if hasattr(env, "exercise_all_exercises") and not hasattr(env, "exercise_index_by_docname"):
+        for attr in EXERCISE_INDICES:
+            setattr(env, attr, dict())
+        for node_id, info in env.exercise_all_exercises.items():
+            index_exercise(env, node_id, info)
+    if hasattr(env, "exercise_all_exercise_lists") and not hasattr(env, "exercise_list_index_by_docname"):
+        env.exercise_list_index_by_docname = dict()
+        for node_id, info in env.exercise_all_exercise_lists.items():
+            index_exercise_list(env, node_id, info)
+
+
+def unindex_exercises(env, docname):
+    """
+    Removes the exercises of `docname` from the env and from the indices, visiting
+    only the exercises of `docname`
+    """
+    for node_id in env.exercise_index_by_docname.pop(docname, []):
+        info = env.exercise_all_exercises.pop(node_id)
+        for attr, key in EXERCISE_INDICES.items():
+            if attr == "exercise_index_by_docname":
+                continue
+            index = getattr(env, attr)
+            ids = index[key(info)]
+            ids.remove(node_id)
+            if not ids:
+                del index[key(info)]
+
+
+def merge_exercises(app, env, docnames, other):
+    """
+    This is run when the environment of a parallel reader `other` is merged back
+
+    The exercises and exercise lists of `docnames`, collected in `other`, are added
+    to the env and to its indices
+    """
+    for docname in docnames:
+        for node_id in getattr(other, "exercise_index_by_docname", {}).get(docname, []):
+            info = other.exercise_all_exercises[node_id]
+            if not hasattr(env, "exercise_all_exercises"):
+                env.exercise_all_exercises = {}
+            env.exercise_all_exercises[node_id] = info
+            index_exercise(env, node_id, info)
+
+        for node_id in getattr(other, "exercise_list_index_by_docname", {}).get(docname, []):
+            info = other.exercise_all_exercise_lists[node_id]
+            if not hasattr(env, "exercise_all_exercise_lists"):
+                env.exercise_all_exercise_lists = {}
+            env.exercise_all_exercise_lists[node_id] = info
+            index_exercise_list(env, node_id, info)
+
+
+def _in_document_order(env, id_lists):
+    """
+    Joins lists of exercise ids in the order of their documents (sorted by docname) and
+    of the exercises in each document, which is the order a serial build collects them in.
+
+    The order of the registries depends on the order documents are read and merged back
+    from parallel readers, and on which documents an incremental build reads again, so
+    exercise lists are not built in that order.
+    """
+    selected = set(node_id for ids in id_lists if ids for node_id in ids)
+    exercises = env.exercise_all_exercises
+    return sorted(selected, key=lambda node_id: (exercises[node_id]["docname"], exercises[node_id]["number"]))
+
+
+def select_exercises(env, listnode, fromdocname):
+    """
+    Returns the ids of the exercises that belong in the exercise list `listnode` of
+    `fromdocname`, in document order, looking them up in the indices
+
+    Logic as follows:
+
+    - If listnode specified labels, the exercises with one of those labels
+    - Else if listnode specified from, the exercises of that document
+    - Else if scope is file, the exercises of fromdocname
+    - Else if scope is section, the exercises from the same section as fromdocname
+    - Else all the exercises
+    """
+    if not getattr(env, "exercise_all_exercises", None):
+        return []
+    ensure_exercise_indices(env)
+    labels = listnode["labels"]
+    if labels is not None:
+        return _in_document_order(env, [env.exercise_index_by_label.get(label) for label in labels])
+
+    by_docname = env.exercise_index_by_docname
+    if listnode["from"] is not None:
+        return _in_document_order(env, [by_docname.get(listnode["from"])])
+    if listnode["scope"] == "file":
+        return _in_document_order(env, [by_docname.get(fromdocname)])
+    elif listnode["scope"] == "section":
+        section = exercise_section(fromdocname)
+        if not section:
+            # the exerciselist is not inside a section, only top level documents
+            return _in_document_order(env, [env.exercise_index_by_section.get("")])
+        # a top level document named as the section is taken to be in it
+        return _in_document_order(env, [
+            env.exercise_index_by_section.get(section),
+            by_docname.get(section) if "/" not in section else None,
+        ])
+
+    return [node_id for docname in sorted(by_docname) for node_id in by_docname[docname]]
+
+
+def retitled_exercise(app, ex_info, fromdocname):
+    """
+    Returns a copy of the exercise of `ex_info` to be added to an exercise list of
+    `fromdocname`, another document, with the heading `Exercise \\d (path)`,
+    e.g. `Exercise 4 (pandas/groupby)`
+    """
+    ex_to_add = ex_info["node_copy"].deepcopy()
+    for text_node in list(ex_to_add.traverse(nodes.Text)):
+        if RE_EXERCISE_NUM.match(text_node):
+            parent = text_node.parent
+            assert isinstance(parent, nodes.strong)  # make sure we have what we think we do
+            _src_path = app.builder.get_relative_uri(
+                fromdocname, ex_info["docname"]
+            )
+            _title_root = ex_to_add["title_root"]
+            new_title = "{} {} ({})".format(_title_root, ex_info["number"] + 1, _src_path)
+            parent.replace_self([nodes.strong(_(new_title), _(new_title))])
+    return ex_to_add
+
+
 class exercise_node(nodes.General, nodes.Element):
     pass
 
@@ -61,13 +220,15 @@ class ExerciselistDirective(SphinxDirective):
         if not hasattr(self.env, 'exercise_all_exercise_lists'):
             self.env.exercise_all_exercise_lists = {}
 
-        self.env.exercise_all_exercise_lists[node_id] = {
+        info = {
             'docname': self.env.docname,
             'lineno': self.lineno,
             'exercise': node.deepcopy(),
             'target': targetnode,
             "number": list_number,
         }
+        self.env.exercise_all_exercise_lists[node_id] = info
+        index_exercise_list(self.env, node_id, info)
 
         return [targetnode, node]
 
@@ -112,7 +273,7 @@ class ExerciseDirective(SphinxDirective):
         if not hasattr(self.env, self.env_attr):
             setattr(self.env, self.env_attr, dict())
 
-        getattr(self.env, self.env_attr)[node_id] = {
+        info = {
             'docname': self.env.docname,
             'lineno': self.lineno,
             'node_copy': node.deepcopy(),
@@ -121,6 +282,8 @@ class ExerciseDirective(SphinxDirective):
             "label": node["label"],
             "title_root": title_root,
         }
+        getattr(self.env, self.env_attr)[node_id] = info
+        index_exercise(self.env, node_id, info)
         return [targetnode, node]
 
 
@@ -129,16 +292,14 @@ def purge_exercises(app, env, docname):
     This is run whenever `docname` processing begins
 
     This is our opportunity to clear a potentially stale cache of exercises
-    for docname
+    for docname, looking up its exercises and exercise lists in the indices
     """
-    for attr in ["exercise_all_exercises", "exercise_all_exercise_lists"]:
-        if not hasattr(env, attr):
-            # no exercises to deal with
-            continue
-        mydict = getattr(env, attr)
-        for k in list(mydict.keys()):
-            if mydict[k]["docname"] == docname:
-                mydict.pop(k)
+    ensure_exercise_indices(env)
+    if hasattr(env, "exercise_all_exercises"):
+        unindex_exercises(env, docname)
+    if hasattr(env, "exercise_all_exercise_lists"):
+        for node_id in env.exercise_list_index_by_docname.pop(docname, []):
+            env.exercise_all_exercise_lists.pop(node_id)
 
 
 def process_exercise_nodes(app, doctree, fromdocname):
@@ -157,10 +318,19 @@ def process_exercise_nodes(app, doctree, fromdocname):
        in an exercise list and removed from source. The inline content will
        be replaced by a link to the new position in the exercise list
     """
+    from ..collector import get_node_index
+
     # extract config values
     include_exercises = app.config.exercise_include_exercises
     inline_exercises = app.config.exercise_inline_exercises
 
+    # documents without exercises or exercise lists are left as they are, without
+    # traversing them, when the node index tells so
+    if app.builder.name in PER_DOCUMENT_BUILDERS:
+        index = get_node_index(app.builder.env, fromdocname)
+        if index is not None and not index["exercises"] and not index["exercise_lists"]:
+            return
+
     # if we don't want exercises, remove them all from the doctree
     if not include_exercises:
         for node in doctree.traverse(exercise_node):
@@ -182,49 +352,6 @@ def process_exercise_nodes(app, doctree, fromdocname):
     # Augment each todo with a backlink to the original location.
     env = app.builder.env
 
-    def should_include_exercise(listnode, exercise_info):
-        """
-        given an exerciselist_node and an exercise_info, check to see if
-        the exercise belongs in the list
-
-        Logic as follows:
-
-        - First check labels. if listnode specified labels,
-          ensure exercise_info["label"] is selected in the lists labels
-        - If that passes, then check listnode's from option. If specified
-          exercise_info["docname"] must match listnode["from"]
-        - If that passes then check scopes.
-            - If scope is file, check if  exercise_info["docname"] matches
-              fromdocname (closed over)
-            - If scope is section, check if exercise_info["docname"] comes
-              from same section as fromdocname
-        - If that passes, include everything
-
-        """
-        # unpack args
-        from_file = listnode["from"]
-        scope = listnode["scope"]
-        labels = listnode["labels"]
-        if labels is not None:
-            # we just check label now
-            return exercise_info["label"] in labels
-
-        ex_src_doc = exercise_info["docname"]
-        if from_file is not None:
-            return ex_src_doc == from_file
-        if scope == "file":
-            return ex_src_doc == fromdocname
-        elif scope == "section":
-            # check if not inside section
-            if ("/" not in ex_src_doc) and ("/" not in fromdocname):
-                return True
-            elif "/" not in fromdocname:
-                # ex_src_doc is in a section, but the exerciselist is not
-                return False
-            return ex_src_doc.rsplit('/', 1)[0] == fromdocname.rsplit('/', 1)[0]
-
-        return True
-
     for node in doctree.traverse(exerciselist_node):
         listinfo = env.exercise_all_exercise_lists[node["_id"]]
         content = []
@@ -233,9 +360,8 @@ def process_exercise_nodes(app, doctree, fromdocname):
             node.parent.remove(node)
             continue
 
-        for ex_id, ex_info in env.exercise_all_exercises.items():
-            if not should_include_exercise(node, ex_info):
-                continue
+        for ex_id in select_exercises(env, node, fromdocname):
+            ex_info = env.exercise_all_exercises[ex_id]
 
             # make link from location in exercise list back to site where exercise appeared
             # in document
@@ -265,21 +391,12 @@ def process_exercise_nodes(app, doctree, fromdocname):
                     all_exercises[ex_id].replace_self([bq])
                     ex_info["removed"] = True
 
-            ex_to_add = ex_info['node_copy'].deepcopy()
             if ex_info["docname"] != listinfo["docname"]:
-                # If the exercise comes from a different file make the heading be
-                # `Exercise \d (path)`, e.g. `Exercise 4 (pandas/groupby)` only here in
-                # the task list... not inline
-                for text_node in ex_to_add.traverse(nodes.Text):
-                    if RE_EXERCISE_NUM.match(text_node):
-                        parent = text_node.parent
-                        assert isinstance(parent, nodes.strong)  # make sure we have what we think we do
-                        _src_path = app.builder.get_relative_uri(
-                            fromdocname, ex_info["docname"]
-                        )
-                        _title_root = ex_to_add["title_root"]
-                        new_title = "{} {} ({})".format(_title_root, ex_info["number"] + 1, _src_path)
-                        parent.replace_self([nodes.strong(_(new_title), _(new_title))])
+                # If the exercise comes from a different file the heading is retitled
+                # only here in the task list... not inline
+                ex_to_add = retitled_exercise(app, ex_info, fromdocname)
+            else:
+                ex_to_add = ex_info['node_copy'].deepcopy()
             content.append(ex_to_add)
             content.append(back_to_text_para)
 
@@ -0,0 +1,60 @@
+from __future__ import unicode_literals
+
+
+class BookIndex():
+    """
+    Collects the parts and chapters of a pdf book from the toctrees of the book index
+    document (jupyter_pdf_book_index) and renders them as LaTeX.
+
+    The entries are collected in a single pass over the toctrees:
+
+    * a toctree caption starts a part, and the documents listed in that toctree are its chapters
+    * without a caption, a first level document with documents below it is a part, and
+      those documents are its chapters
+    * any other document is a chapter
+
+    Links to sections (``doc#section``) and to the bibliography are not part of the book structure.
+    """
+
+    PART = "\\cleardoublepage\\part{{{}}}"
+    CHAPTER = "\\chapter{{{}}}\\input{{{}}}"
+
+    def __init__(self, skip=("zreferences",)):
+        self.skip = skip
+        self.parts = []
+        self.caption = None
+
+    def start_toctree(self):
+        self.caption = None
+
+    def add_caption(self, title):
+        self.caption = {'title': title, 'chapters': []}
+        self.parts.append(self.caption)
+
+    def add_entry(self, level, title, refuri):
+        """
+        Adds the document `refuri` listed at depth `level` of a toctree
+        """
+        if "#" in refuri or refuri in self.skip:
+            return
+        if self.caption is not None:
+            self.caption['chapters'].append((title, refuri))
+        elif level == 1:
+            ## whether this is a part or a chapter is known once the entries below it are added
+            self.parts.append({'title': title, 'docname': refuri, 'chapters': []})
+        elif level == 2 and self.parts and 'docname' in self.parts[-1]:
+            self.parts[-1]['chapters'].append((title, refuri))
+
+    def latex_lines(self):
+        lines = []
+        for part in self.parts:
+            if 'docname' in part and not part['chapters']:
+                lines.append(self.CHAPTER.format(part['title'], part['docname'] + ".tex"))
+                continue
+            lines.append(self.PART.format(part['title']))
+            for title, docname in part['chapters']:
+                lines.append(self.CHAPTER.format(title, docname + ".tex"))
+        return lines
+
+    def latex(self):
+        return "\n".join(self.latex_lines())
@@ -0,0 +1,212 @@
+"""
+Coverage report of the errors raised while executing the notebooks
+"""
+
+import os
+import html
+import shutil
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from io import open
+from sphinx.util.osutil import ensuredir
+from sphinx.util import logging
+
+
+def language_extension(language_info):
+    ## file extension of a kernel language, as used in the names of the report folders
+    if 'extension' in language_info:
+        return language_info['extension']
+    name = language_info['name'].lower()
+    if name.find('python') != -1:
+        return 'py'
+    elif name.find('julia') != -1:
+        return 'jl'
+    return name
+
+
+def error_traceback(error):
+    # Some errors don't provide a traceback. Make sure that some useful information is provided
+    # to the report - if nothing else, the type of error that was caught.
+    traceback = getattr(error, "traceback", None)
+    if traceback is None:
+        traceback = str(error)
+    return traceback
+
+
+class ErrorGroup():
+    """
+    Errors with the same last traceback line, of which only the first `max_tracebacks`
+    tracebacks are kept
+    """
+
+    def __init__(self, last_line, max_tracebacks):
+        self.last_line = last_line
+        self.max_tracebacks = max_tracebacks
+        self.count = 0
+        self.files = OrderedDict()
+        self.tracebacks = []
+
+    def add(self, filename, traceback):
+        self.count += 1
+        self.files[filename] = self.files.get(filename, 0) + 1
+        if self.max_tracebacks is None or len(self.tracebacks) < self.max_tracebacks:
+            self.tracebacks.append((filename, traceback))
+
+
+class CoverageReportWriter():
+    """
+    Writes the coverage report of each language (an HTML report from the coverage template
+    and, with the text_reports option of jupyter_execute_nb, text overviews and the errors of
+    each notebook) to the reports folder of the language.
+
+    The reports are streamed to disk one language at a time. The errors are grouped by
+    the last line of their traceback, and the HTML report shows the number of errors of
+    each group together with at most jupyter_coverage_max_tracebacks of its tracebacks,
+    so a breakage raising the same error in every cell gives a report of bounded size.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, builderSelf):
+        self.produce_text_reports = builderSelf.config["jupyter_execute_nb"]["text_reports"]
+        self.max_tracebacks = builderSelf.config["jupyter_coverage_max_tracebacks"]
+
+    def errors_by_language(self, error_results):
+        ## the notebooks with errors of each language, in the order they were executed
+        languages = OrderedDict()
+        for full_error_set in error_results:
+            if not full_error_set['errors']:
+                continue
+            current_language = full_error_set['language']
+            lang_ext = language_extension(current_language)
+            if lang_ext not in languages:
+                languages[lang_ext] = {
+                    'display_name': current_language['display_name'],
+                    'language': current_language['language'],
+                    'files': OrderedDict(),
+                }
+            languages[lang_ext]['files'][full_error_set['filename']] = full_error_set['errors']
+        return languages
+
+    def template(self, builderSelf):
+        ## lines of the HTML template of the report, None if there is none
+        if not builderSelf.config["jupyter_template_coverage_file_path"]:
+            return None
+        templateFolder = builderSelf.config['jupyter_template_path']
+        error_report_template_file = templateFolder + "/" + builderSelf.config["jupyter_template_coverage_file_path"]
+        if not os.path.isfile(error_report_template_file):
+            self.logger.warning("Unable to generate error report - template {} not found.".format(error_report_template_file))
+            return None
+        with open(error_report_template_file, encoding="UTF-8") as inputFile:
+            return inputFile.readlines()
+
+    def write(self, builderSelf, error_results):
+        template = self.template(builderSelf)
+        for lang_ext, errors in self.errors_by_language(error_results).items():
+            error_dir = builderSelf.errordir.format(lang_ext)
+            ensuredir(error_dir)
+            groups = self.write_text_reports(error_dir, lang_ext, errors)
+            if template is not None:
+                self.write_html_report(error_dir, lang_ext, errors, groups, template)
+
+    def write_text_reports(self, error_dir, lang_ext, errors):
+        """
+        Writes the text reports of the language, and returns the errors grouped by the
+        last line of their traceback, sorted by number of errors
+        """
+        groups = dict()
+        language_display_name = errors['display_name']
+        self.logger.error(language_display_name + " execution errors occurred in the notebooks below")
+
+        lang_error_dir = "{}/{}_errors".format(error_dir, lang_ext)
+        with ExitStack() as stack:
+            if self.produce_text_reports:
+                # purge language results directory and recreate
+                shutil.rmtree(path=lang_error_dir, ignore_errors=True)
+                os.makedirs(lang_error_dir)
+                results_file = stack.enter_context(open("{}/{}_overview.txt".format(error_dir, lang_ext), 'w', encoding="UTF-8"))
+                results_file.write(language_display_name + " execution errors occurred in the notebooks below:\n")
+
+            for filename, notebook_errors in errors['files'].items():
+                self.logger.error(filename)
+                if self.produce_text_reports:
+                    results_file.write("\t{} - {} errors.\n".format(filename, len(notebook_errors)))
+                    error_filename = "{}/{}_errors.txt".format(lang_error_dir, filename)
+                    ensuredir(os.path.dirname(error_filename))
+                    with open(error_filename, "w", encoding="UTF-8") as error_file:
+                        for error in notebook_errors:
+                            error_file.write(error_traceback(error) + "\n")
+
+                for error in notebook_errors:
+                    traceback = error_traceback(error)
+                    lines = traceback.splitlines()
+                    last_line = lines[-1] if lines else ""
+                    if last_line not in groups:
+                        groups[last_line] = ErrorGroup(last_line, self.max_tracebacks)
+                    groups[last_line].add(filename, traceback)
+
+            groups = sorted(groups.values(), key=lambda group: group.count, reverse=True)
+
+            # write error count and errors to overview.txt
+            if self.produce_text_reports:
+                results_file.write("\n----------------------\nError count details: [count] error\n\n")
+                for group in groups:
+                    results_file.write("[{}] {}\n".format(group.count, group.last_line))
+                    results_file.write('\n')
+
+                results_file.write("\nFor specifics, including the cell block, refer to [notebook name]_errors.txt\n")
+        return groups
+
+    def write_html_report(self, error_dir, lang_ext, errors, groups, template):
+        language_display_name = errors['display_name']
+        notebook_list_HTML = "".join(
+            "<li><a href=\"#{}\">{}</a></li>".format(html.escape(lang_ext + "_" + filename), html.escape(filename))
+            for filename in errors['files'])
+        variables = {
+            'ERROR_SUMMARY': "<p>" + language_display_name
+                             + " execution errors occured in the following notebooks:</p><ul>"
+                             + notebook_list_HTML + " </ul>",
+            'DATETIME': time.strftime("%c"),
+        }
+
+        # Save the error report, the errors are written where the template has {NOTEBOOK_LOOP}
+        filename = "errors-" + time.strftime("%d%m%Y") + ".html"
+        full_error_report_filename = os.path.normpath(error_dir + "/" + filename)
+        with open(full_error_report_filename, "w", encoding="UTF-8") as error_output_file:
+            for line in template:
+                for keyName in variables:
+                    line = line.replace("{" + keyName + "}", variables[keyName])
+                if "{NOTEBOOK_LOOP}" not in line:
+                    error_output_file.write(line)
+                    continue
+                before, after = line.split("{NOTEBOOK_LOOP}", 1)
+                error_output_file.write(before)
+                self.write_error_groups(error_output_file, lang_ext, errors, groups)
+                error_output_file.write(after)
+
+    def write_error_groups(self, output, lang_ext, errors, groups):
+        language = errors['language']
+        language_display_name = errors['display_name']
+        for group in groups:
+            output.write("<h3>[{}] {}</h3>\n<p>in {}</p>\n".format(
+                group.count, html.escape(group.last_line),
+                ", ".join("<a href=\"#{}\">{}</a> ({})".format(html.escape(lang_ext + "_" + filename), html.escape(filename), count)
+                          for filename, count in group.files.items())))
+            for filename, traceback in group.tracebacks:
+                output.write("<p>{}</p>\n<pre><code class=\"{}\">{}</code></pre>\n".format(
+                    html.escape(filename), language, html.escape(traceback)))
+            if group.count > len(group.tracebacks):
+                output.write("<p>{} more tracebacks not shown</p>\n".format(group.count - len(group.tracebacks)))
+
+        ## the errors of each notebook, by group
+        errors_by_file = dict()
+        for group in groups:
+            for filename, count in group.files.items():
+                errors_by_file.setdefault(filename, []).append((group.last_line, count))
+
+        for filename, notebook_errors in errors['files'].items():
+            output.write("<h3 id=\"{}\">{} - {} {} errors</h3>\n<ul>\n".format(
+                html.escape(lang_ext + "_" + filename), html.escape(filename), len(notebook_errors), language_display_name))
+            for last_line, count in errors_by_file.get(filename, []):
+                output.write("<li>[{}] {}</li>\n".format(count, html.escape(last_line)))
+            output.write("</ul>\n")
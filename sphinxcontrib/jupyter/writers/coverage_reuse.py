@@ -0,0 +1,116 @@
+"""
+Reuse of executed notebooks: the notebooks executed by a coverage build in the website
+build, and the download notebooks executed for the website notebooks of the same document
+"""
+
+import os
+import json
+import hashlib
+import nbformat
+from copy import deepcopy
+from io import open
+from sphinx.util import logging
+
+
+def code_fingerprint(nb):
+    """
+    Hash of the kernel and the source of the code cells of `nb`, which determine the
+    outputs of its execution
+    """
+    fingerprint = hashlib.sha256(nb['metadata']['kernelspec']['name'].encode('utf-8'))
+    for cell in nb['cells']:
+        if cell['cell_type'] == "code":
+            fingerprint.update(b"\0" + cell['source'].encode('utf-8'))
+    return fingerprint.hexdigest()
+
+
+def graft_outputs(nb, executed_nb):
+    """
+    Copies the outputs of the code cells of `executed_nb`, and the language info added by
+    its execution, into `nb`, a notebook with the same code cells
+    """
+    code_cells = [cell for cell in nb['cells'] if cell['cell_type'] == "code"]
+    executed_cells = [cell for cell in executed_nb['cells'] if cell['cell_type'] == "code"]
+    for cell, executed_cell in zip(code_cells, executed_cells):
+        cell['outputs'] = deepcopy(executed_cell['outputs'])
+        cell['execution_count'] = executed_cell.get('execution_count')
+    if 'language_info' in executed_nb['metadata']:
+        nb['metadata']['language_info'] = deepcopy(executed_nb['metadata']['language_info'])
+    return nb
+
+
+def reused_result(nb, resources):
+    ## task of a reused notebook, whose result is collected as the result of an execution
+    return nb, resources
+
+
+def grafted_result(nb, execution, resources, shared):
+    """
+    Task collected as the execution of `nb`, with the outputs of `execution`, the result of
+    executing a notebook with the same code cells. `shared` marks the notebooks which did not
+    start the execution, so it is only accounted for once.
+
+    The result of the execution is never collected (and modified) itself, so each notebook
+    gets its own copy of the outputs.
+    """
+    executed_nb, executed_resources = execution
+    resources = dict(executed_resources, metadata=resources['metadata'])
+    if shared:
+        resources['shared'] = True
+    return graft_outputs(deepcopy(nb), executed_nb), resources
+
+
+class CoverageNotebookReuse():
+    """
+    Finds the notebooks executed by the coverage build in jupyter_coverage_dir that can be
+    used by the website build instead of executing its own notebooks.
+
+    The coverage build stores the fingerprint of the code cells (see `code_fingerprint`) in the
+    metadata of the notebooks it executes. A website notebook with the same fingerprint, whose
+    latest coverage execution had no errors, gets the outputs of the code cells of the executed
+    notebook, while keeping its own markdown cells (which differ between the builds).
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, builderSelf):
+        self.executeddir = None
+        self.passed = set()
+        config = builderSelf.config
+        if not config["jupyter_coverage_reuse_notebooks"] or config["jupyter_make_coverage"]:
+            return
+        if not config["jupyter_coverage_dir"]:
+            self.logger.warning("jupyter_coverage_reuse_notebooks is set but jupyter_coverage_dir is not, notebooks are executed")
+            return
+
+        results_filename = config["jupyter_coverage_dir"] + "/jupyter/reports/code-execution-results.json"
+        try:
+            with open(results_filename, encoding="UTF-8") as results_file:
+                results = json.load(results_file)['results']
+        except (IOError, ValueError, KeyError):
+            self.logger.warning("Unable to read coverage results {}, notebooks are executed".format(results_filename))
+            return
+
+        failed = set(item['filename'] for item in results if item['num_errors'])
+        self.passed = set(item['filename'] for item in results) - failed
+        self.executeddir = config["jupyter_coverage_dir"] + "/jupyter/executed"
+
+    def executed_notebook(self, nb, full_path):
+        """
+        Returns `nb` with the outputs of the notebook executed by the coverage build, or None
+        if there is no matching notebook
+        """
+        if self.executeddir is None or full_path not in self.passed:
+            return None
+        executed_filename = os.path.join(self.executeddir, full_path + ".ipynb")
+        if not os.path.isfile(executed_filename):
+            return None
+        try:
+            with open(executed_filename, encoding="UTF-8") as executed_file:
+                executed_nb = nbformat.read(executed_file, as_version=4)
+        except (IOError, ValueError) as err:
+            self.logger.warning("Unable to read executed notebook {}: {}".format(executed_filename, err))
+            return None
+        if executed_nb['metadata'].get('code_fingerprint') != code_fingerprint(nb):
+            return None
+
+        return graft_outputs(deepcopy(nb), executed_nb)
@@ -4,12 +4,22 @@ import os.path
 import shutil
 import time
 import json
-from nbconvert.preprocessors import ExecutePreprocessor
+import html
+import base64
+import hashlib
+import sqlite3
+from .execute_preprocessor import InstrumentedExecutePreprocessor
+from .results_store import ExecutionResultsStore
+from .execution_history import ExecutionHistory, TrendDetector, build_record
+from .coverage_report import CoverageReportWriter
+from .coverage_reuse import CoverageNotebookReuse, code_fingerprint, reused_result, grafted_result
+from .fail_fast import FailFast, failure_signature
+from .memory_control import MemoryEstimates, MemoryLimitExceeded, memory_gate
+from .progress import ExecutionProgress
+from .utils import config_number
 from ..writers.convert import convertToHtmlWriter
 from sphinx.util import logging
-import dask
 from dask.distributed import as_completed
-from packaging import version
 from io import open
 import sys
 
@@ -20,9 +30,25 @@ class ExecuteNotebookWriter():
     Executes jupyter notebook written in python or julia
     """
     logger = logging.getLogger(__name__)
-    startFlag = 0
     def __init__(self, builderSelf):
-        pass
+        self.coverage_reuse = CoverageNotebookReuse(builderSelf)
+        ## executions shared by the download and website notebooks of a document, keyed by
+        ## document and code fingerprint, set by the builder when both are executed
+        self.shared_executions = None
+        self.fail_fast = FailFast(builderSelf)
+        ## estimates of the memory of the notebooks, read when the first notebook is executed
+        self.memory_estimates = None
+        memory_gate.configure(config_number(builderSelf.config, "jupyter_execute_memory_budget"))
+    def add_execution_metadata(self, builderSelf, nb, filename):
+        ## metadata of the notebooks to execute, also added to the notebook written by the builder
+        if builderSelf.config["jupyter_target_pdf"]:
+            subdirectory = ''
+            index = filename.rfind('/')
+            if index > 0:
+                subdirectory = filename[0:index]
+                filename = filename[index + 1:]
+            nb = self.add_latex_metadata(builderSelf, nb, subdirectory, filename)
+        return nb
     def execute_notebook(self, builderSelf, nb, filename, params, futures):
         execute_nb_config = builderSelf.config["jupyter_execute_nb"]
         coverage = builderSelf.config["jupyter_make_coverage"]
@@ -36,6 +62,11 @@ class ExecuteNotebookWriter():
             subdirectory = filename[0:index]
             filename = filename[index + 1:]
 
+        if self.fail_fast.hold(params, futures):
+            ## executed once the sample is collected
+            params['held_notebooks'].append((nb, full_path))
+            return
+
         language = nb.metadata.kernelspec.language
         if (language.lower().find('python') != -1):
             language = 'python'
@@ -43,12 +74,20 @@ class ExecuteNotebookWriter():
             language = 'julia'
 
         ## adding latex metadata
-        if builderSelf.config["jupyter_target_pdf"]:
-            nb = self.add_latex_metadata(builderSelf, nb, subdirectory, filename)
+        nb = self.add_execution_metadata(builderSelf, nb, full_path)
 
         # - Parse Directories and execute them - #
         if coverage:
+            ## lets the website build reuse the executed notebook
+            nb.metadata.code_fingerprint = code_fingerprint(nb)
             self.execution_cases(builderSelf, params['destination'], False, subdirectory, language, futures, nb, filename, full_path)
+            return
+
+        executed_nb = None
+        if params['target'] == 'website':
+            executed_nb = self.coverage_reuse.executed_notebook(nb, full_path)
+        if executed_nb is not None:
+            self.reuse_case(builderSelf, params['destination'], subdirectory, futures, executed_nb, filename, full_path)
         else:
             self.execution_cases(builderSelf, params['destination'], True, subdirectory, language, futures, nb, filename, full_path)
 
@@ -93,42 +132,95 @@ class ExecuteNotebookWriter():
 
         ## ensure that executed notebook directory
         ensuredir(builderSelf.executed_notebook_dir)
+        ## output limits applied while the outputs are collected
+        limits = {
+            'max_stream_output_bytes': config_number(builderSelf.config, 'jupyter_max_stream_output_bytes'),
+            'max_outputs_per_cell': config_number(builderSelf.config, 'jupyter_max_outputs_per_cell'),
+            'max_image_output_bytes': config_number(builderSelf.config, 'jupyter_max_image_output_bytes'),
+            ## retries of infrastructure failures
+            'retries': builderSelf.config['jupyter_execute_retries'],
+            'retry_backoff': builderSelf.config['jupyter_execute_retry_backoff'],
+            ## memory bounds of the kernel
+            'memory_limit': config_number(builderSelf.config, 'jupyter_execute_memory_limit'),
+            'memory_estimate': self.memory_estimate(builderSelf, full_path),
+        }
         ## specifying kernels
         if language == 'python':
             if (sys.version_info > (3, 0)):
                 # Python 3 code in this block
-                ep = ExecutePreprocessor(timeout=-1, allow_errors=allow_errors, kernel_name='python3')
+                ep = InstrumentedExecutePreprocessor(timeout=-1, allow_errors=allow_errors, kernel_name='python3', **limits)
             else:
                 # Python 2 code in this block
-                ep = ExecutePreprocessor(timeout=-1, allow_errors=allow_errors, kernel_name='python2')
+                ep = InstrumentedExecutePreprocessor(timeout=-1, allow_errors=allow_errors, kernel_name='python2', **limits)
         elif language == 'julia':
-            ep = ExecutePreprocessor(timeout=-1, allow_errors=allow_errors)
+            ep = InstrumentedExecutePreprocessor(timeout=-1, allow_errors=allow_errors, **limits)
+
+        resources = {"metadata": {"path": builderSelf.executed_notebook_dir, "filename": filename, "filename_with_path": full_path}}
+        if self.shared_executions is None:
+            future = builderSelf.client.submit(ep.execute, nb, resources)
+        else:
+            ## the download and website notebooks only differ in their markdown, so the first one
+            ## is executed and the outputs are grafted into both. It runs in the directory of the
+            ## website notebooks whichever asks first, where the files written by the notebooks
+            ## are found by the notebooks depending on them (jupyter_dependency_lists)
+            key = (full_path, code_fingerprint(nb))
+            execution = self.shared_executions.pop(key, None)
+            shared = execution is not None
+            if execution is None:
+                execution_dir = builderSelf.executedir + "/" + subdirectory if subdirectory != '' else builderSelf.executedir
+                ensuredir(execution_dir)
+                execution_resources = {"metadata": dict(resources['metadata'], path=execution_dir)}
+                execution = builderSelf.client.submit(ep.execute, nb, execution_resources)
+                self.shared_executions[key] = execution
+            future = builderSelf.client.submit(grafted_result, nb, execution, resources, shared, pure=False)
+
+        ### dictionary to store info for errors in future
+        future_dict = { "filename": full_path, "filename_with_path": full_path, "language_info": nb['metadata']['kernelspec']}
+        builderSelf.futuresInfo[future.key] = future_dict
 
-        ### calling this function before starting work to ensure it starts recording
-        if (self.startFlag == 0):
-            self.startFlag = 1
-            builderSelf.client.get_task_stream()
+        futures.append(future)
 
+    def reuse_case(self, builderSelf, directory, subdirectory, futures, nb, filename, full_path):
+        ## collects the notebook executed by the coverage build like the result of an execution
+        if subdirectory != '':
+            builderSelf.executed_notebook_dir = directory + "/" + subdirectory
+        else:
+            builderSelf.executed_notebook_dir = directory
+        ensuredir(builderSelf.executed_notebook_dir)
 
-        future = builderSelf.client.submit(ep.preprocess, nb, {"metadata": {"path": builderSelf.executed_notebook_dir, "filename": filename, "filename_with_path": full_path}})
+        future = builderSelf.client.submit(reused_result, nb, {"metadata": {"path": builderSelf.executed_notebook_dir, "filename": filename, "filename_with_path": full_path}, "reused": True}, pure=False)
 
-        ### dictionary to store info for errors in future
         future_dict = { "filename": full_path, "filename_with_path": full_path, "language_info": nb['metadata']['kernelspec']}
         builderSelf.futuresInfo[future.key] = future_dict
 
         futures.append(future)
 
+    def memory_estimate(self, builderSelf, full_path):
+        ## estimated memory admitted for the execution of the notebook
+        if memory_gate.budget is None:
+            return 0
+        if self.memory_estimates is None:
+            self.memory_estimates = MemoryEstimates(builderSelf)
+        return self.memory_estimates.estimate(full_path)
+
+    def execution_error(self, future, nb):
+        ## returns the exception raised while executing the notebook, if any. Errors in the notebook
+        ## are sent back with the result, errors in the task itself are raised by dask
+        if future.status == 'error':
+            return future.exception()
+        return nb[1].get('execution_error')
 
-    def task_execution_time(self, builderSelf):
-        ## calculates execution time of each task in client using get task stream
-        task_Info_latest = builderSelf.client.get_task_stream()[-1]
-        time_tuple = task_Info_latest['startstops'][0]
+    def execution_stats(self, future, nb):
+        ## returns the statistics recorded by the executing task and sent back with the result
+        if future.status == 'error':
+            return None
+        return nb[1].get('execution_stats')
 
-        if version.parse(dask.__version__) <  version.parse("2.10.0"):
-            computing_time = time_tuple[2] - time_tuple[1]
-        else:
-            computing_time = time_tuple['stop'] - time_tuple['start']
-        return computing_time
+    def execution_retries(self, future, nb):
+        ## returns the failed attempts of an execution retried after infrastructure failures
+        if future.status == 'error':
+            return []
+        return nb[1].get('execution_retries', [])
 
     def check_execution_completion(self, builderSelf, future, nb, error_results, count, total_count, futures_name, params):
         error_result = []
@@ -136,24 +228,36 @@ class ExecuteNotebookWriter():
         status = 'pass'
 
         # computing time for each task 
-        computing_time = self.task_execution_time(builderSelf)
+        stats = self.execution_stats(future, nb)
+        retries = self.execution_retries(future, nb)
+        computing_time = stats['runtime'] if stats else 0
+        error = self.execution_error(future, nb)
+        if stats and not nb[1].get('shared'):
+            builderSelf.telemetry.record("execute", builderSelf.futuresInfo[future.key]['filename_with_path'], stats['start'], stats['stop'], thread="execute")
 
         # store the exceptions in an error result array
-        if future.status == 'error':
+        if error is not None:
             status = 'fail'
             try:
                 builderSelf.execution_status_code = 1
             except:
                 self.logger.warning("No execution status code defined in builder")
 
-            for key,val in builderSelf.futuresInfo.items():
-                if key == future.key:
-                    filename_with_path = val['filename_with_path']
-                    filename = val['filename']
-                    language_info = val['language_info']
-            error_result.append(future.exception())
+            val = builderSelf.futuresInfo[future.key]
+            filename_with_path = val['filename_with_path']
+            filename = val['filename']
+            if isinstance(error, MemoryLimitExceeded):
+                ## killed by the memory limit, rather than failed
+                status = 'memory'
+                self.logger.error("{}: {}".format(filename_with_path, error))
+            language_info = val['language_info']
+            error_result.append(error)
 
         else:
+            if nb[1].get('reused'):
+                status = 'reused'
+            elif nb[1].get('shared'):
+                status = 'shared'
             passed_metadata = nb[1]['metadata'] 
             filename = passed_metadata['filename']
             filename_with_path = passed_metadata['filename_with_path']
@@ -165,22 +269,24 @@ class ExecuteNotebookWriter():
                 executed_nb['metadata']['site_title'] = builderSelf.config['jupyter_pdf_book_title']
             if "jupyter_download_nb" in builderSelf.config and builderSelf.config['jupyter_download_nb']:
                 executed_nb['metadata']['download_nb_path'] = builderSelf.config['jupyter_download_nb_urlpath']
+            if stats and builderSelf.config['jupyter_make_coverage']:
+                ## the profile is only kept in the notebooks of coverage builds, not published
+                executed_nb['metadata']['execution_profile'] = stats
             if (futures_name.startswith('delayed') != -1):
                 # adding in executed notebooks list
                 params['executed_notebooks'].append(filename)
-                key_to_delete = False
-                for nb, arr in params['dependency_lists'].items():
+                keys_to_delete = []
+                for delayed_name, arr in params['dependency_lists'].items():
                     executed = 0
                     for elem in arr:
                         if elem in params['executed_notebooks']:
                             executed += 1
                     if (executed == len(arr)):
-                        key_to_delete = nb
-                        notebook = params['delayed_notebooks'].get(nb)
-                        builderSelf._execute_notebook_class.execute_notebook(builderSelf, notebook, nb, params, params['delayed_futures'])
-                if (key_to_delete):
+                        keys_to_delete.append(delayed_name)
+                        notebook = params['delayed_notebooks'].get(delayed_name)
+                        builderSelf._execute_notebook_class.execute_notebook(builderSelf, notebook, delayed_name, params, params['delayed_futures'])
+                for key_to_delete in keys_to_delete:
                     del params['dependency_lists'][str(key_to_delete)]
-                    key_to_delete = False
             notebook_name = "{}.ipynb".format(filename)
             executed_notebook_path = os.path.join(passed_metadata['path'], notebook_name)
 
@@ -189,19 +295,37 @@ class ExecuteNotebookWriter():
                 if cell['cell_type'] == "code":
                     if cell['metadata']['hide-output']:
                         cell['outputs'] = []
+            ## move output images to files shared by all the notebooks of the website; the
+            ## notebooks of coverage builds keep their images, as they can be reused by a
+            ## website build with another output directory
+            extracted_images = []
+            if builderSelf.config['jupyter_extract_output_images'] and params['target'] == 'website' and not builderSelf.config['jupyter_target_pdf'] \
+                    and not builderSelf.config['jupyter_make_coverage']:
+                depth = filename_with_path.count('/')
+                extracted_images = self.extract_output_images(builderSelf, executed_nb, "../" * (depth + 1))
             #Write Executed Notebook as File
-            with open(executed_notebook_path, "wt", encoding="UTF-8") as f:
+            with builderSelf.telemetry.stage("serialize", filename_with_path), open(executed_notebook_path, "wt", encoding="UTF-8") as f:
                 nbformat.write(executed_nb, f)
             
             ## generate html if needed
             if (builderSelf.config['jupyter_generate_html'] and params['target'] == 'website'):
-                builderSelf._convert_class.convert(executed_nb, filename, language_info, params['destination'], passed_metadata['path'])
+                ## the html files are in html/, and are moved next to _static when the site is made
+                html_depth = depth if builderSelf.config['jupyter_make_site'] else depth + 1
+                for output, image_path in extracted_images:
+                    output['data']['text/html'] = self.image_tag("../" * html_depth + image_path)
+                with builderSelf.telemetry.stage("convert_html", filename_with_path):
+                    builderSelf._convert_class.convert(executed_nb, filename, language_info, params['destination'], passed_metadata['path'])
             
             ## generate pdfs if set to true
             if (builderSelf.config['jupyter_target_pdf']):
                 builderSelf._pdf_class.convert_to_latex(builderSelf, filename_with_path, executed_nb['metadata']['latex_metadata'])
                 builderSelf._pdf_class.move_pdf(builderSelf)
             
+        for retry in retries:
+            self.logger.warning("Retried {} after {:.2f}s: {}".format(filename_with_path, retry['runtime'], retry['error']))
+        if retries:
+            status += " after {} retries".format(len(retries))
+
         print('({}/{})  {} -- {} -- {:.2f}s'.format(count, total_count, filename, status, computing_time))
             
 
@@ -209,12 +333,60 @@ class ExecuteNotebookWriter():
         # storing error info if any execution throws an error
         results = dict()
         results['runtime']  = computing_time
+        results['execution_stats'] = stats
         results['filename'] = filename_with_path
         results['errors']   = error_result
+        results['retries']  = retries
         results['language'] = language_info
         error_results.append(results)
         return filename
 
+    def extract_output_images(self, builderSelf, nb, prefix, folder="_static/outputs"):
+        """
+        Writes the images of the outputs of `nb` to files named after their content under 
+        `folder` in the output directory, so identical figures are stored once across all 
+        notebooks, and replaces them in the outputs by an html image tag with a path
+        starting with `prefix`. 
+        
+        Returns the modified outputs together with the path of their image relative to 
+        the output directory.
+        """
+        extensions = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif', 'image/svg+xml': 'svg'}
+        outputsdir = os.path.join(builderSelf.outdir, folder)
+        ensuredir(outputsdir)
+        extracted = []
+        for cell in nb['cells']:
+            if cell['cell_type'] != "code":
+                continue
+            for output in cell['outputs']:
+                data = output.get('data', {})
+                if 'text/html' in data:
+                    ## the html representation is displayed rather than the image
+                    continue
+                for mime, extension in extensions.items():
+                    if mime not in data:
+                        continue
+                    if mime == 'image/svg+xml':
+                        content = data[mime].encode('utf-8')
+                    else:
+                        content = base64.b64decode(data[mime])
+                    image_name = "{}.{}".format(hashlib.sha256(content).hexdigest()[:20], extension)
+                    image_file = os.path.join(outputsdir, image_name)
+                    if not os.path.exists(image_file):
+                        with open(image_file, "wb") as f:
+                            f.write(content)
+                    image_path = folder + "/" + image_name
+                    for key in extensions:
+                        data.pop(key, None)
+                        output.get('metadata', {}).pop(key, None)
+                    data['text/html'] = self.image_tag(prefix + image_path)
+                    extracted.append((output, image_path))
+                    break
+        return extracted
+
+    def image_tag(self, src):
+        return '<img src="{}" alt="output image">'.format(html.escape(src, quote=True))
+
     def save_executed_notebook(self, builderSelf, params):
         error_results = []
 
@@ -225,54 +397,96 @@ class ExecuteNotebookWriter():
         if (builderSelf.config['jupyter_generate_html'] and params['target'] == 'website'):
             builderSelf._convert_class = convertToHtmlWriter(builderSelf)
 
-        # this for loop gathers results in the background
-        total_count = len(params['futures'])
-        count = 0
-        update_count_delayed = 1
-        for future, nb in as_completed(params['futures'], with_results=True, raise_errors=False):
-            count += 1
-            builderSelf._execute_notebook_class.check_execution_completion(builderSelf, future, nb, error_results, count, total_count, 'futures', params)
-
-        for future, nb in as_completed(params['delayed_futures'], with_results=True, raise_errors=False):
-            count += 1
-            if update_count_delayed == 1:
-                update_count_delayed = 0
-                total_count += len(params['delayed_futures'])
-            builderSelf._execute_notebook_class.check_execution_completion(builderSelf, future, nb, error_results, count, total_count,  'delayed_futures', params)
-
+        held_notebooks = params.get('held_notebooks') or []
+        params['held_notebooks'] = None
+        if self.fail_fast.aborted is not None:
+            ## aborted while collecting the notebooks of another target
+            self.cancel_executions(builderSelf, params, held_notebooks)
+            return error_results
+
+        ## every notebook to collect: the notebooks submitted, waiting for the sample and
+        ## waiting for their dependencies
+        total_count = len(params['futures']) + len(held_notebooks) + len(params['delayed_notebooks'])
+        filenames = [builderSelf.futuresInfo[future.key]['filename_with_path'] for future in params['futures']]
+        filenames += [filename for held_nb, filename in held_notebooks] + list(params['delayed_notebooks'])
+        progress = ExecutionProgress(builderSelf, params['target'], filenames)
+        progress.start()
+        try:
+            count = self.collect(builderSelf, params, held_notebooks, error_results, total_count, progress)
+        finally:
+            progress.stop()
+
+        if self.fail_fast.aborted is not None:
+            self.cancel_executions(builderSelf, params, held_notebooks)
+        elif count < total_count:
+            self.logger.warning("{} notebooks of the {} were not executed as their dependencies did not execute".format(
+                total_count - count, params['target']))
         return error_results
 
-    def produce_code_execution_report(self, builderSelf, error_results, params, fln = "code-execution-results.json"):
+    def collect(self, builderSelf, params, held_notebooks, error_results, total_count, progress):
+        """
+        Collects the executed notebooks in the order they complete, whether they were submitted
+        while writing, after the sample or once their dependencies are executed, until every
+        execution is collected or the execution is aborted. Returns the number of collected notebooks.
+
+        The executions submitted while collecting (by `check_execution_completion` for the
+        delayed notebooks, or when the held notebooks are released) are added to the collector
+        as they are submitted.
+        """
+        completed = as_completed(params['futures'] + params['delayed_futures'], with_results=True, raise_errors=False)
+        submitted = {name: len(params[name]) for name in ('futures', 'delayed_futures')}
+        delayed_keys = set(future.key for future in params['delayed_futures'])
+        sample_keys = set(future.key for future in params['futures']) if held_notebooks else set()
+        count = 0
+        for future, nb in completed:
+            count += 1
+            futures_name = 'delayed_futures' if future.key in delayed_keys else 'futures'
+            builderSelf._execute_notebook_class.check_execution_completion(builderSelf, future, nb, error_results, count, total_count, futures_name, params)
+            progress.collected(error_results[-1]['filename'], error_results[-1]['runtime'])
+            if self.fail_fast.threshold or self.fail_fast.sample:
+                signature = failure_signature(self.execution_error(future, nb), None if future.status == 'error' else nb[0])
+                if self.fail_fast.record(builderSelf.futuresInfo[future.key]['filename_with_path'], signature):
+                    break
+
+            ## the notebooks waiting for the sample to be collected
+            sample_keys.discard(future.key)
+            if held_notebooks and not sample_keys:
+                if self.fail_fast.sample_failed():
+                    break
+                for held_nb, filename in held_notebooks:
+                    self.execute_notebook(builderSelf, held_nb, filename, params, params['futures'])
+                del held_notebooks[:]
+
+            for name in ('futures', 'delayed_futures'):
+                for new_future in params[name][submitted[name]:]:
+                    if name == 'delayed_futures':
+                        delayed_keys.add(new_future.key)
+                    completed.add(new_future)
+                submitted[name] = len(params[name])
+        return count
+
+    def cancel_executions(self, builderSelf, params, held_notebooks):
+        ## cancels the executions which are not collected after the execution is aborted
+        builderSelf.execution_status_code = 1
+        pending = [future for future in params['futures'] + params['delayed_futures'] if not future.done()]
+        self.logger.warning("Cancelled the execution of {} notebooks for {}".format(len(pending) + len(held_notebooks), params['target']))
+        if self.shared_executions:
+            pending.extend(self.shared_executions.values())
+            self.shared_executions.clear()
+        builderSelf.client.cancel(pending)
+
+    def produce_code_execution_report(self, builderSelf, error_results, params, fln = "code-execution-results.json", store_fln = "code-execution-results.sqlite"):
         """
-        Updates the JSON file that contains the results of the execution of each notebook.
+        Stores the results of the execution of each notebook for this build, and updates the
+        JSON file that contains the latest result of each notebook.
         """
         ensuredir(builderSelf.reportdir)
         json_filename = builderSelf.reportdir + fln
 
-        if os.path.isfile(json_filename):
-            with open(json_filename, encoding="UTF-8") as json_file:
-                json_data = json.load(json_file)
-                temp_dictionary = dict()
-                for item in json_data['results']:
-                    name = item['filename']
-                    language = item['language']
-                    if name not in temp_dictionary:
-                        temp_dictionary[name] = dict()
-                    temp_dictionary[name][language] = item
-                json_data['results'] = []
-
-        else:
-            temp_dictionary = dict()
-            json_data = dict()
-            json_data['results'] = []
-
-        # Generate the data for the JSON file.
+        # Generate the results of this build.
+        results = []
         for notebook_errors in error_results:
-            runtime = int(notebook_errors['runtime'] * 10)
-            name = notebook_errors['filename']
             language = notebook_errors['language']['name']
-            seconds = (runtime % 600) / 10
-            minutes = int(runtime / 600)
 
             extension = ''
             if (language.lower().find('python') != -1):
@@ -280,40 +494,128 @@ class ExecuteNotebookWriter():
             elif (language.lower().find('julia') != -1):
                 extension = 'jl'
 
-            nicer_runtime = str(minutes) + ":" + ("0" + str(seconds) if seconds < 10 else str(seconds))
-            new_dictionary = {
-                'filename': name,
-                'runtime': nicer_runtime,
+            results.append({
+                'filename': notebook_errors['filename'],
+                'runtime': notebook_errors['runtime'],
                 'num_errors': len(notebook_errors['errors']),
+                'output_bytes': notebook_errors['execution_stats']['output_bytes'] if notebook_errors['execution_stats'] else None,
+                'retries': len(notebook_errors['retries']),
                 'extension': extension,
                 'language': language
-            }
+            })
 
-            if name not in temp_dictionary:
-                temp_dictionary[name] = dict()
-            temp_dictionary[name][language] = new_dictionary
+        try:
+            store = ExecutionResultsStore(builderSelf.reportdir + store_fln)
+            if store.is_empty() and os.path.isfile(json_filename):
+                ## keep the results of the builds made before the store
+                store.import_json(json_filename, "imported")
+            store.upsert(builderSelf.build_id, time.strftime("%d-%m-%Y %H:%M:%S"), results)
+            store.export_json(json_filename)
+        except (sqlite3.Error, IOError, OSError, ValueError, KeyError) as err:
+            self.logger.warning("Unable to save lecture status in {}: {}".format(builderSelf.reportdir, err))
+
+        return error_results
 
-        temp_list = []
-        for key in temp_dictionary:
-            for second_key in temp_dictionary[key]:
-                temp_list.append(temp_dictionary[key][second_key])
+    def produce_execution_trends_report(self, builderSelf, error_results, params, fln = "execution-trends.json", history_fln = "execution-history.jsonl"):
+        """
+        Appends the results of this build to the execution history, and reports the runtime
+        regressions, new failures and flaky notebooks found against the previous builds.
+        """
+        ensuredir(builderSelf.reportdir)
+        json_filename = builderSelf.reportdir + fln
+        history = ExecutionHistory(builderSelf.reportdir + history_fln, builderSelf.config["jupyter_coverage_history_window"])
+        detector = TrendDetector(builderSelf.config["jupyter_coverage_regression_threshold"],
+                                 builderSelf.config["jupyter_coverage_regression_min_seconds"])
 
-        for item in sorted(temp_list, key=lambda k: k['filename']):
-            json_data['results'].append(item)
-        json_data['run_time'] = time.strftime("%d-%m-%Y %H:%M:%S")
+        record = build_record(builderSelf.build_id, time.strftime("%d-%m-%Y %H:%M:%S"), error_results)
+        try:
+            trends = detector.detect(record, history.recent(exclude_build_id=builderSelf.build_id))
+            history.append(record)
+        except (IOError, OSError, KeyError) as err:
+            self.logger.warning("Unable to update execution history in {}: {}".format(builderSelf.reportdir, err))
+            return
+
+        for item in trends['runtime_regressions']:
+            self.logger.warning("Runtime regression: {} took {:.2f}s (median of previous builds {:.2f}s)".format(
+                item['filename'], item['runtime'], item['baseline']))
+        for item in trends['cell_regressions']:
+            self.logger.warning("Runtime regression: cell {} of {} took {:.2f}s (median of previous builds {:.2f}s)".format(
+                item['source_hash'], item['filename'], item['runtime'], item['baseline']))
+        for item in trends['new_failures']:
+            self.logger.warning("New failure: {} raised {} errors".format(item['filename'], item['num_errors']))
+        for item in trends['flaky']:
+            self.logger.warning("Flaky notebook: {} failed in {} of its last {} builds".format(
+                item['filename'], item['failures'], item['runs']))
 
         try:
-            if (sys.version_info > (3, 0)):
-                with open(json_filename, "w") as json_file:
-                    json.dump(json_data, json_file)
+            with open(json_filename, "w", encoding="UTF-8") as json_file:
+                json.dump(trends, json_file)
+        except IOError:
+            self.logger.warning("Unable to save execution trends JSON file. Does the {} directory exist?".format(builderSelf.reportdir))
+
+    def produce_cell_profile_report(self, builderSelf, error_results, params, fln = "cell-profile.json", html_fln = "cell-profile.html"):
+        """
+        Produces a JSON profile of every executed code cell and an HTML table of the slowest cells
+        in the project, compared against the profile of the previous build.
+        """
+        ensuredir(builderSelf.reportdir)
+        json_filename = builderSelf.reportdir + fln
+        top = builderSelf.config["jupyter_cell_profile_top"]
+
+        ## runtimes of the previous build, keyed by notebook and cell source
+        previous = dict()
+        if os.path.isfile(json_filename):
+            try:
+                with open(json_filename, encoding="UTF-8") as json_file:
+                    for item in json.load(json_file)['cells']:
+                        previous[(item['filename'], item['source_hash'])] = item['runtime']
+            except (IOError, ValueError, KeyError):
+                self.logger.warning("Unable to read previous cell profile {}".format(json_filename))
+
+        cells = []
+        for notebook in error_results:
+            stats = notebook['execution_stats']
+            if not stats:
+                continue
+            for cell in stats['cells']:
+                item = dict(cell)
+                item['filename'] = notebook['filename']
+                item['previous_runtime'] = previous.get((item['filename'], item['source_hash']))
+                cells.append(item)
+        cells.sort(key=lambda k: k['runtime'], reverse=True)
+
+        json_data = {
+            'run_time': time.strftime("%d-%m-%Y %H:%M:%S"),
+            'cells': cells,
+        }
+        try:
+            with open(json_filename, "w") as json_file:
+                json.dump(json_data, json_file)
+        except IOError:
+            self.logger.warning("Unable to save cell profile JSON file. Does the {} directory exist?".format(builderSelf.reportdir))
+
+        rows = ""
+        for rank, cell in enumerate(cells[:top], 1):
+            if cell['previous_runtime'] is None:
+                change = "new"
             else:
-                with open(json_filename, "w") as json_file:
-                    x = json.dumps(json_data, ensure_ascii=False)
-                    if isinstance(x,str):
-                        x = unicode(x, 'UTF-8')
-                    json_file.write(x)
+                change = "{:+.2f}s".format(cell['runtime'] - cell['previous_runtime'])
+            memory_delta = "" if cell['memory_delta'] is None else "{:+.1f}".format(cell['memory_delta'] / 2**20)
+            rows += "<tr><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td><td>{:.2f}s</td><td>{}</td><td>{}</td><td>{}</td></tr>\n".format(
+                rank, html.escape(cell['filename']), cell['index'], html.escape(cell['source']),
+                cell['runtime'], change, cell['output_bytes'], memory_delta)
+
+        html_filename = builderSelf.reportdir + html_fln
+        try:
+            with open(html_filename, "w", encoding="UTF-8") as html_file:
+                html_file.write("<html><head><title>Cell execution profile</title></head><body>\n")
+                html_file.write("<h1>Top {} slowest cells</h1>\n<p>{}</p>\n".format(top, json_data['run_time']))
+                html_file.write("<table>\n<tr><th>#</th><th>Notebook</th><th>Cell</th><th>Source</th>"
+                                "<th>Runtime</th><th>Change</th><th>Output (bytes)</th><th>Memory (MB)</th></tr>\n")
+                html_file.write(rows)
+                html_file.write("</table>\n</body></html>\n")
         except IOError:
-            self.logger.warning("Unable to save lecture status JSON file. Does the {} directory exist?".format(builderSelf.reportdir))
+            self.logger.warning("Unable to save cell profile HTML file. Does the {} directory exist?".format(builderSelf.reportdir))
 
     def produce_dask_processing_report(self, builderSelf, params, fln= "dask-reports.json"):
         """
@@ -339,151 +641,4 @@ class ExecuteNotebookWriter():
         """
         Creates a coverage report of the errors in notebook
         """
-        errors = []
-        error_results = []
-        errors_by_language = dict()
-        produce_text_reports = builderSelf.config["jupyter_execute_nb"]["text_reports"]
-        
-        #Parse Error Set
-        for full_error_set in error_results:
-            error_result = full_error_set['errors']
-            filename = full_error_set['filename']
-            current_language = full_error_set['language']
-            language_name = current_language['extension']
-            if error_result:
-                if language_name not in errors_by_language:
-                    errors_by_language[language_name] = dict()
-                    errors_by_language[language_name]['display_name'] = current_language['display_name']
-                    errors_by_language[language_name]['language'] = current_language['language']
-                    errors_by_language[language_name]['files'] = dict()
-
-                errors += error_result
-                error_files.append(filename)
-
-                errors_by_language[language_name]['files'][filename] = error_result
-
-        # Create the error report from the HTML template, if it exists.
-        templateFolder = builderSelf.config['jupyter_template_path']
-        error_report_template_file = templateFolder + "/" + builderSelf.config["jupyter_template_coverage_file_path"]
-
-        error_report_template = []
-        if not os.path.isfile(error_report_template_file):
-            print("Unable to generate error report - template not found.")
-        else:
-            with open(error_report_template_file, encoding="UTF-8") as inputFile:
-                error_report_template = inputFile.readlines()
-
-        lang_summary = ""
-        notebook_looper = ""
-        for lang_ext in errors_by_language:
-            language_display_name = errors_by_language[lang_ext]['display_name']
-            language = errors_by_language[lang_ext]['language']
-            errors_by_file = errors_by_language[lang_ext]['files']
-            error_dir = builderSelf.errordir.format(lang_ext)
-
-            if produce_text_reports:
-                # set specific language output file
-                lang_error_dir = "{}/{}_errors".format(error_dir, lang_ext)
-                # purge language results directory and recreate
-                shutil.rmtree(path=lang_error_dir, ignore_errors=True)
-                os.makedirs(lang_error_dir)
-
-            if errors_by_file:
-                # errors dictionary
-                error_count_dict = dict()
-                error_files_dict = dict()
-
-                # create the HTML for the notebook filenames
-                notebook_list_HTML = ""
-
-                # write to results file
-                # overview output file
-                if produce_text_reports:
-                    results_file = open("{}/{}_overview.txt".format(error_dir, lang_ext), 'w')
-                    results_file.write(language_display_name + " execution errors occurred in the notebooks below:\n")
-
-                self.logger.error(language_display_name + " execution errors occurred in the notebooks below")
-
-                error_number = 1
-                for filename in errors_by_file:
-                    self.logger.error(filename)
-
-                    number_of_errors = str(len(errors_by_file[filename]))
-                    if produce_text_reports:
-                        results_file.write("\t{} - {} errors.\n".format(filename, number_of_errors))
-
-                    notebook_list_HTML += "<li><a href=\"#{}\">{}</a></li>".format(lang_ext + "_" + filename, filename)
-                    notebook_looper += "<h3 id=\"{}\">{} - {} {} errors</h3>\n".format(
-                        lang_ext + "_" + filename, filename, number_of_errors, language_display_name)
-
-                    if produce_text_reports:
-                        error_file = open("{}/{}_errors.txt".format(lang_error_dir, filename), "w")
-
-                    for error in errors_by_file[filename]:
-                        # Some errors don't provide a traceback. Make sure that some useful information is provided
-                        # to the report - if nothing else, the type of error that was caught.
-                        traceback = getattr(error, "traceback", None)
-                        if traceback is None:
-                            error.traceback = str(error)
-
-                        last_line = error.traceback.splitlines()[-1]
-                        if last_line not in error_files_dict:
-                            error_files_dict[last_line] = []
-                        error_files_dict[last_line].append(error_number)
-
-                        if last_line not in error_count_dict:
-                            error_count_dict[last_line] = 0
-                        error_count_dict[last_line] += 1
-
-                        notebook_looper += "<pre><code class=\""\
-                                        + language\
-                                        + "\">{}</code></pre>\n".format(error.traceback)
-
-                        error_number += 1
-
-                        if produce_text_reports:
-                            error_file.write(error.traceback + "\n")
-
-                    if produce_text_reports:
-                        error_file.close()
-
-                if notebook_list_HTML != "":
-                    lang_summary += "<p>" + language_display_name \
-                                    + " execution errors occured in the following notebooks:</p><ul>"\
-                                    + notebook_list_HTML + " </ul>"
-
-                # write error count and errors to overview.txt
-                if produce_text_reports:
-                    results_file.write("\n----------------------\nError count details: [count] error\n\n")
-                    for key, value in error_count_dict.items():
-                        results_file.write("[{}] {}\n".format(value, key))
-                        results_file.write('\n')
-
-                    results_file.write("\nFor specifics, including the cell block, refer to [notebook name]_errors.txt\n")
-                    results_file.close()
-
-            else:
-                # no errors. Update overview to show that
-                if produce_text_reports:
-                    results_file = open("{}/{}_overview.txt".format(error_dir, lang_ext), 'w')
-                    results_file.write("No errors occurred!\n")
-                    results_file.close()
-
-            # create the dictionary of variables to inject into the HTML template
-            variables = dict()
-            variables['ERROR_SUMMARY'] = lang_summary
-            variables['NOTEBOOK_LOOP'] = notebook_looper
-            variables['DATETIME'] = time.strftime("%c")
-
-            # Save the error report.
-            filename = "errors-" + time.strftime("%d%m%Y") + ".html"
-            full_error_report_filename = os.path.normpath(error_dir + "/" + filename)
-            with open(full_error_report_filename, "w", encoding="UTF-8") as error_output_file:
-                for line in error_report_template:
-                    for keyName in variables:
-                        target_string = "{" + keyName + "}"
-                        line = line.replace(target_string, variables[keyName])
-
-                    error_output_file.write(line)
-
-
+        CoverageReportWriter(builderSelf).write(builderSelf, error_results)
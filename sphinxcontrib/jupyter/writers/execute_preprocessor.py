@@ -0,0 +1,364 @@
+"""
+ExecutePreprocessor that records execution statistics inside the executing task
+"""
+
+import errno
+import hashlib
+import json
+import os
+import signal
+import threading
+import time
+import zmq
+import nbformat.v4
+from copy import deepcopy
+from nbclient.exceptions import CellControlSignal, DeadKernelError
+from nbconvert.preprocessors import ExecutePreprocessor
+from traitlets import Float, Integer
+from .memory_control import MemoryLimitExceeded, memory_gate
+from .progress import running_executions
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def infrastructure_failure(err):
+    """
+    Whether `err` was raised by the kernel or its connection (kernel death, kernel start
+    timeout, port collision, ZMQ error) rather than by the code of the notebook
+    """
+    if isinstance(err, CellControlSignal):
+        ## errors and timeouts of the code of a cell
+        return False
+    if isinstance(err, (DeadKernelError, zmq.ZMQError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(err, OSError):
+        return err.errno == errno.EADDRINUSE
+    if isinstance(err, RuntimeError):
+        ## raised by nbclient when the kernel does not reply on start
+        return str(err).startswith("Kernel")
+    return False
+
+
+def kernel_pid(km):
+    """
+    Returns the process id of the kernel started by the kernel manager `km`, or None
+    if it cannot be determined (remote or not yet started kernels)
+    """
+    if km is None:
+        return None
+    provisioner = getattr(km, 'provisioner', None)
+    if provisioner is not None:
+        # jupyter_client >= 7
+        process = getattr(provisioner, 'process', None)
+    else:
+        process = getattr(km, 'kernel', None)
+    return getattr(process, 'pid', None)
+
+
+def _proc_status_bytes(pid, field):
+    ## reads a memory field (reported in kB) from /proc/<pid>/status
+    try:
+        with open("/proc/{}/status".format(pid)) as status:
+            for line in status:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def current_rss(pid):
+    """
+    Returns the current resident set size (in bytes) of process `pid`, or None if it
+    cannot be determined
+    """
+    if pid is None:
+        return None
+    rss = _proc_status_bytes(pid, "VmRSS:")
+    if rss is None and psutil is not None:
+        try:
+            rss = psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            pass
+    return rss
+
+
+def peak_rss(pid):
+    """
+    Returns the peak resident set size (in bytes) of process `pid`.
+
+    Uses the high water mark kept by the linux kernel so that short lived peaks
+    inside a cell are not missed. Falls back to the current resident set size
+    reported by psutil on other platforms, and None when neither is available.
+    """
+    if pid is None:
+        return None
+    rss = _proc_status_bytes(pid, "VmHWM:")
+    if rss is None:
+        rss = current_rss(pid)
+    return rss
+
+
+class KernelMemoryWatchdog(threading.Thread):
+    """
+    Polls the resident memory of the kernel process `pid`, and kills the kernel when it
+    exceeds `limit` bytes. The resident memory at the time of the kill is kept as `killed_rss`.
+    """
+
+    def __init__(self, pid, limit, interval=0.5):
+        super(KernelMemoryWatchdog, self).__init__(name="kernel-memory-watchdog-{}".format(pid))
+        self.daemon = True
+        self.pid = pid
+        self.limit = limit
+        self.interval = interval
+        self.killed_rss = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            rss = current_rss(self.pid)
+            if rss is None:
+                ## the kernel has exited
+                return
+            if rss > self.limit:
+                self.killed_rss = rss
+                try:
+                    os.kill(self.pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+                except OSError:
+                    pass
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+def output_size(outputs):
+    """
+    Returns the size in bytes of the content of a list of cell outputs
+    """
+    size = 0
+    for output in outputs:
+        if 'text' in output:
+            size += len(output['text'].encode('utf-8'))
+        for value in output.get('data', {}).values():
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            size += len(value.encode('utf-8'))
+        for line in output.get('traceback', []):
+            size += len(line.encode('utf-8'))
+    return size
+
+
+class InstrumentedExecutePreprocessor(ExecutePreprocessor):
+    """
+    Executes a notebook and records, in the worker executing it, when execution
+    started and stopped, how long the kernel took to start, the runtime, output size
+    and memory change of every code cell and the peak resident memory of the kernel.
+
+    The statistics are returned with the executed notebook as
+    ``resources['execution_stats']``. If execution fails they are attached to the
+    raised exception as ``execution_stats`` so failed notebooks are timed as well.
+
+    Outputs can be capped while they are collected from the kernel: the bytes of
+    stream output per cell, the number of outputs per cell and the size of image
+    outputs. Truncated outputs are replaced by a marker saying what was omitted.
+    """
+
+    max_stream_output_bytes = Integer(None, allow_none=True,
+        help="Maximum number of bytes of stream output kept per cell").tag(config=True)
+    max_outputs_per_cell = Integer(None, allow_none=True,
+        help="Maximum number of outputs kept per cell, error outputs are always kept").tag(config=True)
+    max_image_output_bytes = Integer(None, allow_none=True,
+        help="Maximum size in bytes of the (base64 encoded) data of an image output").tag(config=True)
+    retries = Integer(0,
+        help="Number of times the execution is retried after an infrastructure failure").tag(config=True)
+    retry_backoff = Float(1.0,
+        help="Seconds waited before the first retry, doubled for each further retry").tag(config=True)
+    memory_limit = Integer(None, allow_none=True,
+        help="Resident memory in bytes above which the kernel is killed").tag(config=True)
+    memory_estimate = Integer(0,
+        help="Estimated memory in bytes of the execution, used to admit it").tag(config=True)
+
+    def execute(self, nb, resources):
+        """
+        Entry point for executing the notebook as a dask task.
+
+        Exceptions do not keep their attributes when dask serializes them, so rather
+        than raising, a failure is returned as ``resources['execution_error']``
+        alongside the statistics recorded up to the failure.
+
+        Infrastructure failures (see `infrastructure_failure`) are retried up to `retries`
+        times on a fresh copy of the notebook, with an exponential backoff. The failed
+        attempts are returned as ``resources['execution_retries']``.
+
+        The execution waits until `memory_gate` admits its estimated memory, and is then
+        registered in `running_executions` until it finishes.
+        """
+        with memory_gate.admit(self.memory_estimate), running_executions.track(resources['metadata']['filename_with_path']):
+            return self.execute_with_retries(nb, resources)
+
+    def execute_with_retries(self, nb, resources):
+        source_nb = deepcopy(nb) if self.retries else None
+        retries = []
+        while True:
+            try:
+                nb, resources = self.preprocess(nb, resources)
+                break
+            except Exception as err:
+                if len(retries) < self.retries and infrastructure_failure(err):
+                    backoff = self.retry_backoff * 2 ** len(retries)
+                    retries.append({
+                        'error': "{}: {}".format(type(err).__name__, err),
+                        'runtime': err.execution_stats['runtime'],
+                        'backoff': backoff,
+                    })
+                    time.sleep(backoff)
+                    nb = deepcopy(source_nb)
+                    continue
+                resources['execution_stats'] = err.execution_stats
+                resources['execution_error'] = err
+                break
+        if retries:
+            resources['execution_retries'] = retries
+        return nb, resources
+
+    def preprocess(self, nb, resources=None, km=None):
+        self.execution_stats = {
+            'start': time.time(),
+            'stop': None,
+            'runtime': None,
+            'kernel_startup': None,
+            'cells': [],
+            'peak_rss': None,
+            'output_bytes': 0,
+        }
+        self.output_counters = dict()
+        self.watchdog = None
+        if resources is None:
+            resources = {}
+        try:
+            nb, resources = super(InstrumentedExecutePreprocessor, self).preprocess(nb, resources, km)
+        except Exception as err:
+            self.finish_stats()
+            if self.watchdog is not None and self.watchdog.killed_rss is not None:
+                ## the kernel died because it was killed by the watchdog
+                err = MemoryLimitExceeded(self.watchdog.killed_rss, self.memory_limit)
+                self.execution_stats['peak_rss'] = max(self.execution_stats['peak_rss'] or 0, self.watchdog.killed_rss)
+            err.execution_stats = self.execution_stats
+            raise err
+        self.finish_stats()
+        resources['execution_stats'] = self.execution_stats
+        return nb, resources
+
+    def preprocess_cell(self, cell, resources, index):
+        stats = self.execution_stats
+        if stats['kernel_startup'] is None:
+            # the kernel has been started and is ready when the first cell is reached
+            stats['kernel_startup'] = time.time() - stats['start']
+        if cell.cell_type != 'code':
+            return super(InstrumentedExecutePreprocessor, self).preprocess_cell(cell, resources, index)
+
+        pid = kernel_pid(getattr(self, 'km', None))
+        if self.memory_limit and self.watchdog is None and pid is not None:
+            self.watchdog = KernelMemoryWatchdog(pid, self.memory_limit)
+            self.watchdog.start()
+        rss_before = current_rss(pid)
+        cell_start = time.time()
+        try:
+            cell, resources = super(InstrumentedExecutePreprocessor, self).preprocess_cell(cell, resources, index)
+        finally:
+            runtime = time.time() - cell_start
+            cell = self.nb.cells[index]
+            counters = self.output_counters.get(index)
+            if counters and counters['dropped']:
+                cell.outputs.append(nbformat.v4.new_output("stream", name="stderr",
+                    text="[... {} further outputs omitted ...]\n".format(counters['dropped'])))
+            rss_after = current_rss(pid)
+            memory_delta = None
+            if rss_before is not None and rss_after is not None:
+                memory_delta = rss_after - rss_before
+            stats['cells'].append({
+                'index': index,
+                'execution_count': cell.get('execution_count'),
+                'source': cell.source.strip().split("\n")[0][:80],
+                'source_hash': hashlib.sha1(cell.source.encode('utf-8')).hexdigest()[:12],
+                'runtime': runtime,
+                'output_bytes': output_size(cell.get('outputs', [])),
+                'memory_delta': memory_delta,
+                'truncated': bool(counters and counters['truncated']),
+            })
+            self.record_memory(pid)
+        return cell, resources
+
+    def record_memory(self, pid):
+        rss = peak_rss(pid)
+        if rss is not None and (self.execution_stats['peak_rss'] is None or rss > self.execution_stats['peak_rss']):
+            self.execution_stats['peak_rss'] = rss
+
+    def finish_stats(self):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        stats = self.execution_stats
+        stats['stop'] = time.time()
+        stats['runtime'] = stats['stop'] - stats['start']
+        stats['output_bytes'] = sum(cell['output_bytes'] for cell in stats['cells'])
+
+    def output(self, outs, msg, display_id, cell_index):
+        """
+        Applies the output limits to each output message before it is added to the cell
+        """
+        msg_type = msg['msg_type']
+        counters = self.output_counters.setdefault(cell_index, {'stream_bytes': 0, 'dropped': 0, 'truncated': False})
+
+        ## nbclient adds each stream message as an output, so with a limit on the number of
+        ## outputs a stream message extending the last output is merged into it
+        merge = False
+        if msg_type != 'error' and self.max_outputs_per_cell is not None:
+            merge = msg_type == 'stream' and self.extends_stream(outs, msg)
+            if not merge and len(outs) >= self.max_outputs_per_cell:
+                counters['dropped'] += 1
+                counters['truncated'] = True
+                return None
+
+        if msg_type == 'stream' and self.max_stream_output_bytes is not None:
+            text = msg['content']['text']
+            size = len(text.encode('utf-8'))
+            remaining = self.max_stream_output_bytes - counters['stream_bytes']
+            if remaining <= 0:
+                counters['truncated'] = True
+                return None
+            counters['stream_bytes'] += size
+            if size > remaining:
+                text = text.encode('utf-8')[:remaining].decode('utf-8', 'ignore')
+                text += "\n[... stream output truncated after {} bytes ...]\n".format(self.max_stream_output_bytes)
+                msg = dict(msg, content=dict(msg['content'], text=text))
+                counters['truncated'] = True
+
+        if msg_type in ('display_data', 'execute_result') and self.max_image_output_bytes is not None:
+            data = msg['content'].get('data', {})
+            omitted = [(mime, len(value)) for mime, value in data.items()
+                       if mime.startswith('image/') and len(value) > self.max_image_output_bytes]
+            if omitted:
+                data = dict((mime, value) for mime, value in data.items() if not mime.startswith('image/'))
+                data['text/plain'] = "\n".join("[{} output of {} bytes omitted]".format(mime, size) for mime, size in omitted)
+                metadata = dict((mime, value) for mime, value in msg['content'].get('metadata', {}).items()
+                                if not mime.startswith('image/'))
+                msg = dict(msg, content=dict(msg['content'], data=data, metadata=metadata))
+                counters['truncated'] = True
+
+        if merge:
+            outs[-1]['text'] += msg['content']['text']
+            return outs[-1]
+        return super(InstrumentedExecutePreprocessor, self).output(outs, msg, display_id, cell_index)
+
+    def extends_stream(self, outs, msg):
+        ## whether the stream message continues the last output of the cell, unless the output
+        ## is captured by a widget or the outputs are about to be cleared
+        if not outs or outs[-1].get('output_type') != 'stream' or outs[-1].get('name') != msg['content'].get('name'):
+            return False
+        if self.output_hook_stack.get(msg['parent_header'].get('msg_id')) or self.clear_before_next_output:
+            return False
+        return True
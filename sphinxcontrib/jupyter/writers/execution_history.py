@@ -0,0 +1,176 @@
+"""
+History of the execution of the notebooks across builds, and detection of trends
+"""
+
+import os
+import json
+from collections import deque, OrderedDict
+from io import open
+from sphinx.util import logging
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def build_record(build_id, run_time, error_results):
+    """
+    Compact record of the execution of a build: the runtime, number of errors and peak
+    resident memory of each notebook, and the runtime of each of its code cells keyed by
+    source hash
+    """
+    notebooks = []
+    for notebook in error_results:
+        stats = notebook['execution_stats']
+        cells = OrderedDict()
+        if stats:
+            for cell in stats['cells']:
+                ## cells with the same source add up
+                cells[cell['source_hash']] = round(cells.get(cell['source_hash'], 0) + cell['runtime'], 3)
+        notebooks.append({
+            'filename': notebook['filename'],
+            'language': notebook['language']['name'],
+            'runtime': round(notebook['runtime'], 3),
+            'num_errors': len(notebook['errors']),
+            'peak_rss': stats['peak_rss'] if stats else None,
+            'cells': cells,
+        })
+    return {'build_id': build_id, 'run_time': run_time, 'notebooks': notebooks}
+
+
+def find_history(builderSelf, history_fln = "execution-history.jsonl"):
+    """
+    Returns the execution history of the coverage builds of this build directory, or else of
+    jupyter_coverage_dir, None if there is none
+    """
+    paths = [builderSelf.reportdir + history_fln]
+    if builderSelf.config["jupyter_coverage_dir"]:
+        paths.append(builderSelf.config["jupyter_coverage_dir"] + "/jupyter/reports/" + history_fln)
+    for path in paths:
+        if os.path.isfile(path):
+            return ExecutionHistory(path, builderSelf.config["jupyter_coverage_history_window"])
+    return None
+
+
+class ExecutionHistory():
+    """
+    Append-only JSON lines file with one record (see `build_record`) per build.
+
+    Each build appends a single line, so the file is never rewritten, and only the
+    latest `window` records are kept in memory when it is read.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, path, window):
+        self.path = path
+        self.window = window
+
+    def recent(self, exclude_build_id=None):
+        ## the latest records, from the oldest to the latest
+        records = deque(maxlen=self.window)
+        if not os.path.isfile(self.path):
+            return list(records)
+        with open(self.path, encoding="UTF-8") as history_file:
+            for line in history_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    ## an interrupted build may leave a truncated line
+                    continue
+                if record.get('build_id') != exclude_build_id:
+                    records.append(record)
+        return list(records)
+
+    def peak_rss(self):
+        ## the largest peak resident memory of each notebook in the latest records
+        peaks = dict()
+        for record in self.recent():
+            for notebook in record['notebooks']:
+                rss = notebook.get('peak_rss')
+                if rss is not None and rss > peaks.get(notebook['filename'], 0):
+                    peaks[notebook['filename']] = rss
+        return peaks
+
+    def runtimes(self):
+        ## the median runtime of each notebook in the latest records
+        runtimes = dict()
+        for record in self.recent():
+            for notebook in record['notebooks']:
+                runtimes.setdefault(notebook['filename'], []).append(notebook['runtime'])
+        return {filename: median(values) for filename, values in runtimes.items()}
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with open(self.path, "a", encoding="UTF-8") as history_file:
+            history_file.write(line)
+
+
+class TrendDetector():
+    """
+    Compares the record of a build against the records of the previous builds, and finds
+
+    * runtime regressions: notebooks and cells slower than the median of their previous
+      runtimes by more than `threshold` (a fraction) and at least `min_seconds`
+    * new failures: notebooks with errors which had none in their previous execution
+    * flaky notebooks: notebooks which went from passing to failing (or back) more than once
+    """
+
+    def __init__(self, threshold, min_seconds):
+        self.threshold = threshold
+        self.min_seconds = min_seconds
+
+    def is_regression(self, runtime, baseline):
+        return runtime - baseline >= self.min_seconds and runtime > baseline * (1 + self.threshold)
+
+    def detect(self, record, history):
+        previous = dict()
+        for past_record in history:
+            for notebook in past_record['notebooks']:
+                previous.setdefault((notebook['filename'], notebook['language']), []).append(notebook)
+
+        trends = {
+            'build_id': record['build_id'],
+            'run_time': record['run_time'],
+            'builds_compared': len(history),
+            'runtime_regressions': [],
+            'cell_regressions': [],
+            'new_failures': [],
+            'flaky': [],
+        }
+        for notebook in record['notebooks']:
+            key = (notebook['filename'], notebook['language'])
+            runs = previous.get(key)
+            if not runs:
+                continue
+            item = {'filename': notebook['filename'], 'language': notebook['language']}
+
+            baseline = median([run['runtime'] for run in runs])
+            if self.is_regression(notebook['runtime'], baseline):
+                trends['runtime_regressions'].append(dict(item, runtime=notebook['runtime'], baseline=baseline))
+
+            cell_runtimes = dict()
+            for run in runs:
+                for source_hash, runtime in run['cells'].items():
+                    cell_runtimes.setdefault(source_hash, []).append(runtime)
+            for source_hash, runtime in notebook['cells'].items():
+                if source_hash not in cell_runtimes:
+                    continue
+                baseline = median(cell_runtimes[source_hash])
+                if self.is_regression(runtime, baseline):
+                    trends['cell_regressions'].append(dict(item, source_hash=source_hash, runtime=runtime, baseline=baseline))
+
+            if notebook['num_errors'] and not runs[-1]['num_errors']:
+                trends['new_failures'].append(dict(item, num_errors=notebook['num_errors']))
+
+            failed = [bool(run['num_errors']) for run in runs] + [bool(notebook['num_errors'])]
+            changes = sum(1 for before, after in zip(failed, failed[1:]) if before != after)
+            if changes > 1:
+                trends['flaky'].append(dict(item, failures=sum(failed), runs=len(failed)))
+
+        for key in ('runtime_regressions', 'cell_regressions'):
+            trends[key].sort(key=lambda k: k['runtime'] - k['baseline'], reverse=True)
+        return trends
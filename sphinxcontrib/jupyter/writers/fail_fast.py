@@ -0,0 +1,95 @@
+"""
+Early abort of the execution of the notebooks when they fail for the same reason
+"""
+
+from collections import OrderedDict
+from sphinx.util import logging
+from .coverage_report import error_traceback
+from .utils import config_number
+
+
+def failure_signature(error, nb):
+    """
+    Returns "ename: evalue" of the exception raised while executing a notebook, or of the
+    first error output of the executed notebook `nb` (notebooks executed with allow_errors),
+    None if the notebook has no error
+    """
+    if error is not None:
+        if getattr(error, "ename", None):
+            return "{}: {}".format(error.ename, error.evalue)
+        lines = error_traceback(error).splitlines()
+        return lines[-1] if lines else type(error).__name__
+    if nb is None:
+        return None
+    for cell in nb['cells']:
+        if cell['cell_type'] != "code":
+            continue
+        for output in cell.get('outputs', []):
+            if output['output_type'] == "error":
+                return "{}: {}".format(output['ename'], output['evalue'])
+    return None
+
+
+class FailFast():
+    """
+    Groups the failed notebooks by failure signature (see `failure_signature`) as they
+    are collected, and aborts the execution when the same failure is raised by
+    jupyter_execute_fail_fast notebooks, as happens when a shared dependency breaks.
+
+    With jupyter_execute_sample, only the first notebooks of each target are executed
+    until they are collected, and the other notebooks are only executed if the sample
+    does not abort the execution (or, without jupyter_execute_fail_fast, if some
+    notebook of the sample does not fail).
+
+    The notebooks of each target are counted separately (see `reset`), while an abort
+    applies to the targets collected afterwards.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, builderSelf):
+        self.threshold = config_number(builderSelf.config, "jupyter_execute_fail_fast")
+        self.sample = config_number(builderSelf.config, "jupyter_execute_sample")
+        self.aborted = None
+        self.reset()
+
+    def reset(self):
+        ## the distinct notebooks collected, failed and failed with each signature
+        self.groups = OrderedDict()
+        self.collected = set()
+        self.failed = set()
+
+    def hold(self, params, futures):
+        ## whether a notebook submitted to futures waits for the sample to be collected
+        if not self.sample or params.get('held_notebooks') is None or futures is not params['futures']:
+            return False
+        return len(futures) >= self.sample
+
+    def record(self, filename, signature):
+        """
+        Records a collected notebook, and returns True when the execution has to be aborted
+        """
+        self.collected.add(filename)
+        if signature is None:
+            return False
+        self.failed.add(filename)
+        filenames = self.groups.setdefault(signature, [])
+        if filename not in filenames:
+            filenames.append(filename)
+        if self.threshold and len(self.groups[signature]) >= self.threshold:
+            self.abort(signature)
+            return True
+        return False
+
+    def sample_failed(self):
+        ## without a threshold, the sample aborts the execution when all its notebooks failed
+        if self.threshold or not self.collected or len(self.failed) < len(self.collected):
+            return False
+        signature = max(self.groups, key=lambda key: len(self.groups[key]))
+        self.abort(signature)
+        return True
+
+    def abort(self, signature):
+        self.aborted = signature
+        filenames = self.groups[signature]
+        self.logger.error("Aborting the execution of the notebooks: {} notebooks failed with\n    {}\nin {}".format(
+            len(filenames), signature, ", ".join(filenames)))
@@ -3,6 +3,8 @@ import nbformat
 
 from .translate_code import JupyterCodeTranslator
 from .translate_all import JupyterTranslator
+from .translate_html import JupyterHTMLTranslator
+from .translate_pdf import JupyterPDFTranslator, JupyterPDFHTMLTranslator
 
 
 class JupyterWriter(docutils.writers.Writer):
@@ -18,10 +20,16 @@ class JupyterWriter(docutils.writers.Writer):
             self.document.settings.indents = \
             self.builder.env.config.xml_pretty
 
+        docname = getattr(self.builder, 'current_docname', None)
         visitor = self.translator_class(self.builder, self.document)
 
-        self.document.walkabout(visitor)
-        self.output = nbformat.writes(visitor.output)
+        with self.builder.telemetry.stage("translate", docname):
+            visitor.translate_document(self.document)
+        with self.builder.telemetry.stage("serialize", docname):
+            ## the cells are created without validation, so the notebook is validated once
+            ## here (raising rather than logging the error like nbformat.writes)
+            nbformat.validate(visitor.output)
+            self.output = nbformat.v4.writes_json(visitor.output)
 
     def _set_ref_urlpath(self, urlpath=None):
         """
@@ -41,6 +49,10 @@ class JupyterWriter(docutils.writers.Writer):
         the entire sphinx RST file to a Jupyter notebook, whereas 'code' only translates the code cells, and
         skips over all other content.
 
+        When translating everything, the translator is specialized for the target: JupyterPDFTranslator
+        when jupyter_target_pdf is set (JupyterPDFHTMLTranslator together with jupyter_target_html),
+        JupyterHTMLTranslator when jupyter_target_html is set and JupyterTranslator for plain notebooks.
+
         Typically, you would use 'code' when you're testing your code blocks, not for final publication of your
         notebooks.
 
@@ -66,4 +78,12 @@ class JupyterWriter(docutils.writers.Writer):
                     .format(builder.config["jupyter_conversion_mode"]))
                 code_only = True
 
-        return JupyterCodeTranslator if code_only else JupyterTranslator
+        if code_only:
+            return JupyterCodeTranslator
+        if builder.config["jupyter_target_pdf"] and builder.config["jupyter_target_html"]:
+            return JupyterPDFHTMLTranslator
+        if builder.config["jupyter_target_pdf"]:
+            return JupyterPDFTranslator
+        if builder.config["jupyter_target_html"]:
+            return JupyterHTMLTranslator
+        return JupyterTranslator
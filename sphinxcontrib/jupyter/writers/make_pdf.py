@@ -30,6 +30,7 @@ class MakePDFWriter():
         for path in [self.pdfdir, self.texdir]:
             ensuredir(path)
 
+        self.telemetry = builder.telemetry
         self.pdf_exporter = PDFExporter()
         self.tex_exporter = LatexExporter()
         self.index_book = builder.config['jupyter_pdf_book_index']
@@ -104,10 +105,11 @@ class MakePDFWriter():
         if not True in excluded_files:    
             ## --output-dir - forms a directory in the same path as fl_ipynb - need a way to specify properly?
             ### converting to pdf using xelatex subprocess
-            if sys.version_info[0] < 3:
-                subprocess.call(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
-            else:
-                subprocess.run(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
+            with self.telemetry.stage("latex", filename):
+                if sys.version_info[0] < 3:
+                    subprocess.call(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
+                else:
+                    subprocess.run(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
 
             ### check if subdirectory
             subdirectory = ""
@@ -132,16 +134,18 @@ class MakePDFWriter():
                 # exit() - to be used when we want the execution to stop on error
 
     def subprocess_xelatex(self, fl_tex, filename):
-        p = subprocess.Popen(("xelatex", "-interaction=nonstopmode","-jobname=" + filename, fl_tex), stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        output, error = p.communicate()
+        with self.telemetry.stage("xelatex", filename):
+            p = subprocess.Popen(("xelatex", "-interaction=nonstopmode","-jobname=" + filename, fl_tex), stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
+            output, error = p.communicate()
         if (p.returncode != 0):
             self.logger.warning('xelatex exited with returncode {} , encounterd in {} with error -- {}'.format(p.returncode , filename, error))
 
         # assert (p.returncode == 0), self.logger.warning('xelatex exited with returncode {} , encounterd in {} with error -- {}'.format(p.returncode , filename, error)) ---- assert statement stops the program, will handle it later
 
     def subprocess_bibtex(self, filename):
-        p = subprocess.Popen(('bibtex',filename), stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        output, error = p.communicate()
+        with self.telemetry.stage("bibtex", filename):
+            p = subprocess.Popen(('bibtex',filename), stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
+            output, error = p.communicate()
         if (p.returncode != 0):
             self.logger.warning('bibtex exited with returncode {} , encounterd in {} with error -- {} {}'.format(p.returncode , filename, output, error))
         
@@ -157,10 +161,11 @@ class MakePDFWriter():
         fl_tex_template = builder.confdir + "/" + template_folder + "/" + builder.config['jupyter_latex_template_book']
 
 
-        if sys.version_info[0] < 3:
-            subprocess.call(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
-        else:
-            subprocess.run(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
+        with self.telemetry.stage("latex", self.index_book):
+            if sys.version_info[0] < 3:
+                subprocess.call(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
+            else:
+                subprocess.run(["jupyter", "nbconvert","--to","latex","--template",fl_tex_template,"from", fl_ipynb])
 
     def create_pdf_from_latex(self, fl_tex, filename):
         ## parses the latex file to create pdf
@@ -65,6 +65,9 @@ class MakeSiteWriter():
                 ## copies the report of execution results
                 if os.path.exists(self.coveragedir + "/jupyter/reports/code-execution-results.json"):
                     shutil.copy2(self.coveragedir + "/jupyter/reports/code-execution-results.json", self.websitedir + "_static/")
+                ## copies the runtime regressions, new failures and flaky notebooks of the latest coverage build
+                if os.path.exists(self.coveragedir + "/jupyter/reports/execution-trends.json"):
+                    shutil.copy2(self.coveragedir + "/jupyter/reports/execution-trends.json", self.websitedir + "_static/")
             else:
                 self.logger.error("coverage directory not found. Please ensure to run coverage build before running website build")
         else:
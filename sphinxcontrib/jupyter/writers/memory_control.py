@@ -0,0 +1,97 @@
+"""
+Memory bounds of the execution of the notebooks: admission of the executions while there
+is memory headroom, and a limit on the resident memory of each kernel
+"""
+
+import threading
+from contextlib import contextmanager
+from .execution_history import find_history
+from .utils import config_number
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class MemoryLimitExceeded(Exception):
+    """
+    Raised when a kernel is killed for using more resident memory than jupyter_execute_memory_limit
+    """
+
+    def __init__(self, rss, limit):
+        self.rss = rss
+        self.limit = limit
+        super(MemoryLimitExceeded, self).__init__(
+            "Kernel killed: resident memory of {:.0f} MB exceeded the limit of {:.0f} MB".format(rss / 2**20, limit / 2**20))
+
+
+class MemoryGate():
+    """
+    Admits the execution of a notebook while the estimated memory of the running executions
+    and the notebook fits in `budget`, and the system has that much memory available (when
+    psutil is installed). An execution is always admitted when nothing else runs, so a
+    notebook estimated above the budget runs on its own.
+
+    The executing tasks are run by the dask workers of the builder process, and wait in
+    `admit` until they are admitted.
+    """
+    poll_interval = 1.0
+
+    def __init__(self):
+        self.budget = None
+        self.reserved = 0
+        self.running = 0
+        self.condition = threading.Condition()
+
+    def configure(self, budget):
+        self.budget = budget
+
+    def has_headroom(self, estimate):
+        if self.running == 0:
+            return True
+        if self.reserved + estimate > self.budget:
+            return False
+        if psutil is not None and psutil.virtual_memory().available < estimate:
+            return False
+        return True
+
+    @contextmanager
+    def admit(self, estimate):
+        if self.budget is None:
+            yield
+            return
+        with self.condition:
+            ## the available memory also changes outside of the build, so it is polled
+            while not self.has_headroom(estimate):
+                self.condition.wait(self.poll_interval)
+            self.reserved += estimate
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.reserved -= estimate
+                self.running -= 1
+                self.condition.notify_all()
+
+
+## the gate of the executions of this process, looked up by the executing tasks
+memory_gate = MemoryGate()
+
+
+class MemoryEstimates():
+    """
+    Estimates of the memory needed to execute each notebook: the largest peak resident
+    memory of the notebook in the execution history of the coverage builds (of this build
+    directory, or of jupyter_coverage_dir), or jupyter_execute_memory_limit for notebooks
+    without history
+    """
+
+    def __init__(self, builderSelf):
+        self.default = config_number(builderSelf.config, "jupyter_execute_memory_limit") or 0
+        history = find_history(builderSelf)
+        self.peaks = history.peak_rss() if history is not None else dict()
+
+    def estimate(self, filename):
+        return self.peaks.get(filename, self.default)
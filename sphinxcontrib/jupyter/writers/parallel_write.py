@@ -0,0 +1,84 @@
+"""
+Parallel writing (sphinx-build -j) of notebooks
+"""
+
+import sphinx
+from sphinx.locale import __
+from sphinx.util import logging
+from sphinx.util.build_phase import BuildPhase
+from sphinx.util.parallel import ParallelTasks, make_chunks
+try:
+    from sphinx.util.display import status_iterator
+except ImportError:
+    from sphinx.util import status_iterator
+
+SPHINX_VERSION = sphinx.version_info
+
+
+class ParallelWriter():
+    """
+    Writes the documents in the write workers forked by sphinx, while the notebooks are
+    executed in the main process.
+
+    The dask client, the futures and the delayed notebooks of the builder only live in the
+    main process, so the workers do not execute notebooks: each worker translates and writes
+    the notebooks of a chunk of documents and returns the execution requests of the chunk
+    (see `translate_notebooks` of the builders), which are submitted with `submit_execution`
+    as soon as the chunk is done. The telemetry recorded in the workers is returned along.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, builderSelf):
+        pass
+
+    def resolve_doctree(self, builderSelf, docname):
+        if SPHINX_VERSION[0] >= 9:
+            return builderSelf.env.get_and_resolve_doctree(docname, builderSelf, tags=builderSelf.tags)
+        return builderSelf.env.get_and_resolve_doctree(docname, builderSelf)
+
+    def write_parallel(self, builderSelf, docnames, nproc):
+        def write_process(docs):
+            builderSelf.phase = BuildPhase.WRITING
+            first_event = len(builderSelf.telemetry.events)
+            requests = []
+            for docname, doctree in docs:
+                requests.extend(builderSelf.translate_notebooks(docname, doctree))
+            return requests, builderSelf.telemetry.events[first_event:]
+
+        def on_chunk_done(args, result):
+            requests, events = result
+            builderSelf.telemetry.events.extend(events)
+            for request in requests:
+                builderSelf.submit_execution(*request)
+            next(progress)
+
+        # warm up caches using the first document, written in this process
+        firstname, docnames = docnames[0], docnames[1:]
+        builderSelf.phase = BuildPhase.RESOLVING
+        doctree = self.resolve_doctree(builderSelf, firstname)
+        builderSelf.phase = BuildPhase.WRITING
+        builderSelf.write_doc_serialized(firstname, doctree)
+        builderSelf.write_doc(firstname, doctree)
+
+        tasks = ParallelTasks(nproc)
+        chunks = make_chunks(docnames, nproc)
+
+        if "verbosity" in builderSelf.config:
+            verbosity = builderSelf.config.verbosity
+        else:
+            verbosity = builderSelf.app.verbosity
+        progress = status_iterator(chunks, __('writing output... '), "darkgreen",
+                                   len(chunks), verbosity)
+
+        builderSelf.phase = BuildPhase.RESOLVING
+        for chunk in chunks:
+            arg = []
+            for docname in chunk:
+                doctree = self.resolve_doctree(builderSelf, docname)
+                builderSelf.write_doc_serialized(docname, doctree)
+                arg.append((docname, doctree))
+            tasks.add_task(write_process, arg, on_chunk_done)
+
+        # make sure all workers have finished and their requests are submitted
+        tasks.join()
+        self.logger.info('')
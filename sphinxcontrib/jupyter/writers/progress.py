@@ -0,0 +1,165 @@
+"""
+Live progress of the execution of the notebooks
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from io import open
+from sphinx.util import logging
+from sphinx.util.osutil import ensuredir
+from .execution_history import find_history
+from .utils import config_number
+
+
+class RunningExecutions():
+    """
+    Start time of the notebooks being executed by the dask workers of this process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = dict()
+
+    @contextmanager
+    def track(self, filename):
+        with self.lock:
+            self.started[filename] = time.time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.started.pop(filename, None)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.started)
+
+
+## the executions of this process, registered by the executing tasks
+running_executions = RunningExecutions()
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    return "{}:{:02d}:{:02d}".format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+class ExecutionProgress():
+    """
+    Reports the progress of the execution of the notebooks of a target every
+    jupyter_execute_progress_interval seconds: the number of done, running and queued
+    notebooks, the running notebooks with their elapsed time, and an estimate of the time
+    left. The progress is logged, and written to reports/execution-status-<target>.json
+    (replaced atomically, so it can be polled while the build runs), one file per target so
+    the status of the downloads does not replace the status of the website.
+
+    The time left is estimated with the median runtime of each notebook in the execution
+    history of the coverage builds, or the mean runtime of the notebooks with a known
+    runtime, divided by the number of dask worker threads.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, builderSelf, target, filenames, fln = "execution-status-{}.json"):
+        self.interval = config_number(builderSelf.config, "jupyter_execute_progress_interval", float)
+        self.target = target
+        self.filenames = list(filenames)
+        self.filename_set = set(self.filenames)
+        self.status_filename = builderSelf.reportdir + fln.format(target)
+        self.reportdir = builderSelf.reportdir
+        self.parallelism = max(builderSelf.n_workers * builderSelf.threads_per_worker, 1)
+        history = find_history(builderSelf) if self.interval else None
+        self.estimates = history.runtimes() if history is not None else dict()
+        self.done = dict()
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if not self.interval:
+            return
+        self.report()
+        self.thread = threading.Thread(target=self.run, name="execution-progress-{}".format(self.target))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.report(state="finished")
+
+    def collected(self, filename, runtime):
+        with self.lock:
+            self.done[filename] = runtime
+
+    def estimate(self, filename, default):
+        if filename in self.estimates:
+            return self.estimates[filename]
+        return default
+
+    def status(self, state):
+        now = time.time()
+        running = running_executions.snapshot()
+        with self.lock:
+            done = dict(self.done)
+        running = [(filename, now - started) for filename, started in sorted(running.items(), key=lambda item: item[1])
+                   if filename in self.filename_set and filename not in done]
+        running_names = set(filename for filename, elapsed in running)
+        queued = [filename for filename in self.filenames if filename not in done and filename not in running_names]
+
+        known = list(self.estimates.values()) + list(done.values())
+        default = sum(known) / len(known) if known else None
+        eta = None
+        if default is not None:
+            left = sum(self.estimate(filename, default) for filename in queued)
+            left += sum(max(self.estimate(filename, default) - elapsed, 0) for filename, elapsed in running)
+            eta = left / self.parallelism
+
+        return {
+            'target': self.target,
+            'state': state,
+            'updated': time.strftime("%d-%m-%Y %H:%M:%S"),
+            'elapsed': now - self.start_time,
+            'total': len(self.filenames),
+            'done': len(done),
+            'running': [{'filename': filename, 'elapsed': elapsed, 'estimate': self.estimates.get(filename)}
+                        for filename, elapsed in running],
+            'queued': len(queued),
+            'eta': eta,
+        }
+
+    def report(self, state="running"):
+        status = self.status(state)
+        running = ", ".join("{} ({})".format(item['filename'], format_duration(item['elapsed'])) for item in status['running'])
+        self.logger.info("[{}] {}/{} done, {} running, {} queued, {} elapsed, {} left{}".format(
+            self.target, status['done'], status['total'], len(status['running']), status['queued'],
+            format_duration(status['elapsed']), format_duration(status['eta']), ": " + running if running else ""))
+        try:
+            self.write_status(status)
+        except (IOError, OSError) as err:
+            self.logger.warning("Unable to write execution status {}: {}".format(self.status_filename, err))
+
+    def write_status(self, status):
+        ## replaces the status file atomically, so readers never see a partial file
+        ensuredir(self.reportdir)
+        fd, temp_filename = tempfile.mkstemp(dir=self.reportdir, suffix=".json")
+        try:
+            with open(fd, "w", encoding="UTF-8") as status_file:
+                json.dump(status, status_file)
+            os.chmod(temp_filename, 0o644)
+            os.replace(temp_filename, self.status_filename)
+        except Exception:
+            os.unlink(temp_filename)
+            raise
@@ -0,0 +1,171 @@
+"""
+Store of the execution results of the notebooks of every build
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+from contextlib import closing
+from io import open
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    build_id TEXT PRIMARY KEY,
+    run_time TEXT NOT NULL,
+    sequence INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    filename TEXT NOT NULL,
+    language TEXT NOT NULL,
+    build_id TEXT NOT NULL REFERENCES builds (build_id),
+    runtime REAL NOT NULL,
+    num_errors INTEGER NOT NULL,
+    output_bytes INTEGER,
+    extension TEXT NOT NULL,
+    retries INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (filename, language, build_id)
+);
+"""
+
+## in the order of the items of the JSON export
+RESULT_COLUMNS = ('filename', 'runtime', 'num_errors', 'output_bytes', 'extension', 'language', 'retries')
+
+
+def format_runtime(runtime):
+    """
+    Formats a runtime in seconds as minutes:seconds, to a tenth of a second
+    """
+    runtime = int(runtime * 10)
+    seconds = (runtime % 600) / 10
+    minutes = int(runtime / 600)
+    return str(minutes) + ":" + ("0" + str(seconds) if seconds < 10 else str(seconds))
+
+
+def parse_runtime(runtime):
+    ## seconds of a runtime formatted by format_runtime
+    minutes, seconds = runtime.split(":")
+    return int(minutes) * 60 + float(seconds)
+
+
+class ExecutionResultsStore():
+    """
+    SQLite database (in the reports directory) of the execution results of each
+    notebook, keyed by (filename, language, build id).
+
+    Results are upserted in a single transaction, so concurrent builds writing to the
+    same reports directory do not lose each other's results, and the results of every
+    build are kept for historical queries. The latest result of each notebook is exported
+    as the JSON file (code-execution-results.json) read by the website.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        with closing(self.connect()) as connection:
+            connection.executescript(SCHEMA)
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(results)")]
+            if 'retries' not in columns:
+                ## stores created before the retries were recorded
+                connection.execute("ALTER TABLE results ADD COLUMN retries INTEGER NOT NULL DEFAULT 0")
+
+    def connect(self):
+        ## autocommit mode, transactions are started explicitly
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    def is_empty(self):
+        with closing(self.connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM builds").fetchone()[0] == 0
+
+    def upsert(self, build_id, run_time, results):
+        """
+        Adds (or replaces) the results of build_id, a list of dictionaries with the
+        RESULT_COLUMNS, with the runtime in seconds
+        """
+        with closing(self.connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                sequence = connection.execute(
+                    "SELECT sequence FROM builds WHERE build_id = ?", (build_id,)).fetchone()
+                if sequence is None:
+                    connection.execute(
+                        "INSERT INTO builds (build_id, run_time, sequence) "
+                        "SELECT ?, ?, COALESCE(MAX(sequence), 0) + 1 FROM builds", (build_id, run_time))
+                else:
+                    connection.execute("UPDATE builds SET run_time = ? WHERE build_id = ?", (run_time, build_id))
+                connection.executemany(
+                    "INSERT OR REPLACE INTO results (build_id, {}) VALUES (?, {})".format(
+                        ", ".join(RESULT_COLUMNS), ", ".join("?" * len(RESULT_COLUMNS))),
+                    [(build_id,) + tuple(result[column] for column in RESULT_COLUMNS) for result in results])
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def latest_results(self):
+        """
+        Returns the result of each (filename, language) in the latest build that executed it,
+        sorted by filename, together with the run time of the latest build
+        """
+        with closing(self.connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(
+                "SELECT results.*, builds.run_time FROM results JOIN builds USING (build_id) "
+                "WHERE builds.sequence = (SELECT MAX(b.sequence) FROM results AS r JOIN builds AS b USING (build_id) "
+                "WHERE r.filename = results.filename AND r.language = results.language) "
+                "ORDER BY results.filename, results.language").fetchall()
+            latest = connection.execute(
+                "SELECT run_time FROM builds ORDER BY sequence DESC LIMIT 1").fetchone()
+        return [dict(row) for row in rows], latest[0] if latest else None
+
+    def history(self, filename, language=None):
+        """
+        Returns the results of filename in every build, from the oldest to the latest build
+        """
+        query = ("SELECT results.*, builds.run_time FROM results JOIN builds USING (build_id) "
+                 "WHERE results.filename = ?")
+        args = [filename]
+        if language is not None:
+            query += " AND results.language = ?"
+            args.append(language)
+        with closing(self.connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(query + " ORDER BY builds.sequence", args).fetchall()
+        return [dict(row) for row in rows]
+
+    def import_json(self, json_filename, build_id):
+        """
+        Imports the results of a JSON file exported by an earlier build as build_id
+        """
+        with open(json_filename, encoding="UTF-8") as json_file:
+            json_data = json.load(json_file)
+        results = []
+        for item in json_data['results']:
+            item = dict(item)
+            item['runtime'] = parse_runtime(item['runtime'])
+            item.setdefault('output_bytes', None)
+            item.setdefault('retries', 0)
+            results.append(item)
+        self.upsert(build_id, json_data.get('run_time', ''), results)
+
+    def export_json(self, json_filename):
+        """
+        Writes the latest results as JSON, replacing json_filename atomically
+        """
+        results, run_time = self.latest_results()
+        json_data = {'results': [], 'run_time': run_time}
+        for row in results:
+            item = {column: row[column] for column in RESULT_COLUMNS}
+            item['runtime'] = format_runtime(row['runtime'])
+            json_data['results'].append(item)
+
+        directory = os.path.dirname(json_filename) or "."
+        fd, temp_filename = tempfile.mkstemp(dir=directory, suffix=".json")
+        try:
+            with open(fd, "w", encoding="UTF-8") as json_file:
+                json.dump(json_data, json_file)
+            os.chmod(temp_filename, 0o644)
+            os.replace(temp_filename, json_filename)
+        except Exception:
+            os.unlink(temp_filename)
+            raise
@@ -0,0 +1,133 @@
+"""
+Wall time telemetry for the stages of a build
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from io import open
+from sphinx.util.osutil import ensuredir
+from sphinx.util import logging
+
+
+class BuildTelemetry():
+    """
+    Records the wall time spent in each stage of the build (translation, serialization,
+    execution, conversion, ...) for every document.
+
+    Stages are timed with the `stage` context manager, or recorded afterwards with
+    `record` when the timing was measured elsewhere (e.g. inside an execution task).
+    When telemetry is disabled both are no-ops.
+
+    The recorded events are written as a JSON summary and in the Chrome trace-event
+    format, which can be loaded in chrome://tracing or https://ui.perfetto.dev
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self.origin = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, docname=None):
+        if not self.enabled:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, docname, start, time.time())
+
+    def record(self, name, docname, start, stop, thread=None):
+        if not self.enabled:
+            return
+        event = {
+            'stage': name,
+            'docname': docname,
+            'start': start,
+            'duration': stop - start,
+            'pid': os.getpid(),
+            'thread': thread if thread is not None else threading.current_thread().name,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        """
+        Returns the total, count and maximum wall time of each stage, together with the
+        time spent in each stage for every document
+        """
+        stages = dict()
+        documents = dict()
+        for event in self.events:
+            stage = stages.setdefault(event['stage'], {'count': 0, 'total': 0.0, 'max': 0.0})
+            stage['count'] += 1
+            stage['total'] += event['duration']
+            stage['max'] = max(stage['max'], event['duration'])
+            if event['docname'] is not None:
+                document = documents.setdefault(event['docname'], dict())
+                document[event['stage']] = document.get(event['stage'], 0.0) + event['duration']
+        return {
+            'wall_time': time.time() - self.origin,
+            'stages': stages,
+            'documents': documents,
+        }
+
+    def trace_events(self):
+        """
+        Returns the events in Chrome trace-event format. Events recorded on the same
+        thread that overlap in time (such as notebooks executing concurrently) are
+        spread over separate lanes so the viewer does not nest them.
+        """
+        lanes = dict()
+        tids = dict()
+        trace = []
+        for event in sorted(self.events, key=lambda e: e['start']):
+            stop = event['start'] + event['duration']
+            thread_lanes = lanes.setdefault((event['pid'], event['thread']), [])
+            for index, lane_stop in enumerate(thread_lanes):
+                if lane_stop <= event['start']:
+                    thread_lanes[index] = stop
+                    break
+            else:
+                index = len(thread_lanes)
+                thread_lanes.append(stop)
+            lane = event['thread'] if index == 0 else "{} #{}".format(event['thread'], index)
+            key = (event['pid'], lane)
+            if key not in tids:
+                tids[key] = len(tids) + 1
+                trace.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': event['pid'], 'tid': tids[key],
+                    'args': {'name': lane},
+                })
+            name = event['stage'] if event['docname'] is None else "{} {}".format(event['stage'], event['docname'])
+            trace.append({
+                'name': name,
+                'cat': event['stage'],
+                'ph': 'X',
+                'ts': (event['start'] - self.origin) * 1e6,
+                'dur': event['duration'] * 1e6,
+                'pid': event['pid'],
+                'tid': tids[key],
+                'args': {'docname': event['docname']},
+            })
+        return trace
+
+    def write(self, reportdir, fln="build-telemetry.json", trace_fln="build-trace.json"):
+        if not self.enabled:
+            return
+        ensuredir(reportdir)
+        try:
+            with open(os.path.join(reportdir, fln), "w") as json_file:
+                data = self.summary()
+                data['events'] = self.events
+                json.dump(data, json_file)
+            with open(os.path.join(reportdir, trace_fln), "w") as json_file:
+                json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, json_file)
+        except IOError:
+            self.logger.warning("Unable to save build telemetry. Does the {} directory exist?".format(reportdir))
@@ -1,19 +1,21 @@
 from __future__ import unicode_literals
 import re
-import nbformat.v4
 from docutils import nodes, writers
 from .translate_code import JupyterCodeTranslator
-from .utils import JupyterOutputCellGenerators
+from .utils import JupyterOutputCellGenerators, new_markdown_cell
 from shutil import copyfile
-import copy
 import os
 
 
 class JupyterTranslator(JupyterCodeTranslator, object):
     """ Jupyter Translator for Text and Code
+
+    Translates to plain notebooks. Output specific to html and pdf targets is
+    produced by the JupyterHTMLTranslator and JupyterPDFTranslator subclasses
     """
 
     SPLIT_URI_ID_REGEX = re.compile(r"([^\#]*)\#?(.*)")
+    INLINE_MATH_FORMAT = "$ {} $"
 
     def __init__(self, builder, document):
         super(JupyterTranslator, self).__init__(builder, document)
@@ -54,9 +56,6 @@ class JupyterTranslator(JupyterCodeTranslator, object):
         self.reference_text_start = 0
         self.in_reference = False
         self.list_level = 0
-        self.skip_next_content = False
-        self.content_depth = self.jupyter_pdf_showcontentdepth
-        self.content_depth_to_skip = None
         self.remove_next_content = False
         self.in_citation = False
         self.math_block_label = None
@@ -68,28 +67,14 @@ class JupyterTranslator(JupyterCodeTranslator, object):
         # Slideshow option
         self.metadata_slide = False  #False is the value by default for all the notebooks
         self.slide = "slide" #value by default
-        
-        ## pdf book options
-        self.in_book_index = False
-        self.book_index_previous_links = []
-        self.markdown_lines_trimmed = []
 
 
+    def translate_document(self, document):
+        document.walkabout(self)
+
     # specific visit and depart methods
     # ---------------------------------
 
-    def visit_document(self, node):
-        """at start
-        """
-        JupyterCodeTranslator.visit_document(self, node)
-
-        ## if the source file parsed is book index file and target is pdf
-        if self.book_index is not None and self.book_index in self.source_file_name and self.jupyter_pdf_book:
-            self.in_book_index = True
-
-
-
-
     def depart_document(self, node):
         """at end
         Almost the exact same implementation as that of the superclass.
@@ -143,19 +128,12 @@ class JupyterTranslator(JupyterCodeTranslator, object):
 
         text = node.astext()
 
-        ## removing references from index file book
-        if self.in_book_index and 'references' in text.lower():
-            return
-
         #Escape Special markdown chars except in code block
         if self.in_code_block == False:
             text = text.replace("$", "\$")
 
         if self.in_math:
-            if self.jupyter_target_pdf:
-                text = '${}$'.format(text.strip())  #must remove spaces between $ and math for latex
-            else:
-                text = '$ {} $'.format(text.strip())
+            text = self.INLINE_MATH_FORMAT.format(text.strip())
         elif self.in_math_block and self.math_block_label:
             text = "$$\n{0}{1}$${2}".format(
                         text.strip(), self.math_block_label, self.sep_paras
@@ -199,9 +177,6 @@ class JupyterTranslator(JupyterCodeTranslator, object):
         implementation as is done in http://docutils.sourceforge.net/docs/ref/rst/directives.html#image
 
         """
-        ### preventing image from the index file at the moment
-        if self.in_book_index:
-            return
         uri = node.attributes["uri"]
         self.images.append(uri)             #TODO: list of image files
         if self.jupyter_download_nb_image_urlpath:
@@ -230,10 +205,6 @@ class JupyterTranslator(JupyterCodeTranslator, object):
                 image += 'align="{}"'.format(attrs["align"])
             image = image.rstrip() + ">\n\n"  #Add double space for html
         self.markdown_lines.append(image)
-    
-    def depart_image(self, node):
-        if self.jupyter_target_pdf:
-            self.markdown_lines.append("\n")
 
     # math
     def visit_math(self, node):
@@ -255,10 +226,7 @@ class JupyterTranslator(JupyterCodeTranslator, object):
             # the flag is raised, the function can be exited.
             return
 
-        if self.jupyter_target_pdf:
-            formatted_text = "${}$".format(math_text) #must remove spaces between $ and math for latex
-        else:
-            formatted_text = "$ {} $".format(math_text)
+        formatted_text = self.INLINE_MATH_FORMAT.format(math_text)
 
         if self.table_builder:
             self.table_builder['line_pending'] += formatted_text
@@ -286,14 +254,7 @@ class JupyterTranslator(JupyterCodeTranslator, object):
 
         #check for labelled math
         if node["label"]:
-            #Use \tags in the LaTeX environment
-            if self.jupyter_target_pdf:
-                if "ids" in node and len(node["ids"]):
-                    #pdf should have label following tag and removed html id tags in visit_target
-                    referenceBuilder = " \\tag{" + str(node["number"]) + "}" + "\\label{" + node["ids"][0] + "}\n"
-            else:
-                referenceBuilder = " \\tag{" + str(node["number"]) + "}\n"                  #node["ids"] should always exist for labelled displaymath
-            formatted_text = formatted_text.rstrip("$$\n") + referenceBuilder + "$${}".format(self.sep_paras)
+            formatted_text = formatted_text.rstrip("$$\n") + self.math_label(node) + "$${}".format(self.sep_paras)
 
         self.markdown_lines.append(formatted_text)
 
@@ -312,15 +273,7 @@ class JupyterTranslator(JupyterCodeTranslator, object):
 
         #check for labelled math
         if node["label"]:
-            #Use \tags in the LaTeX environment
-            if self.jupyter_target_pdf:
-                if "ids" in node and len(node["ids"]):
-                    #pdf should have label following tag and removed html id tags in visit_target
-                    referenceBuilder = " \\tag{" + str(node["number"]) + "}" + "\\label{" + node["ids"][0] + "}\n"
-            else:
-                referenceBuilder = " \\tag{" + str(node["number"]) + "}\n"
-            #node["ids"] should always exist for labelled displaymath
-            self.math_block_label = referenceBuilder
+            self.math_block_label = self.math_label(node)
 
     def depart_math_block(self, node):
         if self.in_list:
@@ -328,6 +281,10 @@ class JupyterTranslator(JupyterCodeTranslator, object):
 
         self.in_math_block = False
 
+    def math_label(self, node):
+        #Use \tags in the LaTeX environment
+        return " \\tag{" + str(node["number"]) + "}\n"
+
     def visit_table(self, node):
         self.table_builder = dict()
         self.table_builder['column_widths'] = []
@@ -398,13 +355,12 @@ class JupyterTranslator(JupyterCodeTranslator, object):
         self.in_footnote_reference = True
         refid = node.attributes['refid']
         ids = node.astext()
-        if self.jupyter_target_html:
-            link = "<sup><a href=#{} id={}-link>[{}]</a></sup>".format(refid, refid, ids)
-        else:
-            link = "<sup>[{}](#{})</sup>".format(ids, refid)
-        self.markdown_lines.append(link)
+        self.markdown_lines.append(self.footnote_link(refid, ids))
         raise nodes.SkipNode
 
+    def footnote_link(self, refid, ids):
+        return "<sup>[{}](#{})</sup>".format(ids, refid)
+
     def depart_footnote_reference(self, node):
         self.in_footnote_reference = False
 
@@ -448,39 +404,19 @@ class JupyterTranslator(JupyterCodeTranslator, object):
     # title(section)
     def visit_title(self, node):
         JupyterCodeTranslator.visit_title(self, node)
-
-        ### to remove the main title from ipynb as they are already added by metadata
-        if self.jupyter_target_pdf and self.section_level == 1 and not self.in_topic:
-            return
-        else:
-            self.add_markdown_cell()
+        self.add_markdown_cell()
         if self.in_topic:
-            ### this prevents from making it a subsection from section
-            if self.jupyter_target_pdf and self.section_level == 1:
-                self.markdown_lines.append(
-                    "{} ".format("#" * (self.section_level)))
-            else:
-                self.markdown_lines.append(
-                    "{} ".format("#" * (self.section_level + 1)))
+            self.markdown_lines.append(
+                "{} ".format("#" * (self.section_level + 1)))
         elif self.table_builder:
             self.markdown_lines.append(
                 "### {}\n".format(node.astext()))
         else:
-            ### this makes all the sections go up one level to transform subsections to sections
-            if self.jupyter_target_pdf:
-                self.markdown_lines.append(
-                "{} ".format("#" * (self.section_level -1)))
-            else:
-                self.markdown_lines.append(
-                    "{} ".format("#" * self.section_level))
+            self.markdown_lines.append(
+                "{} ".format("#" * self.section_level))
 
     def depart_title(self, node):
         if not self.table_builder:
-
-            ### to remove the main title from ipynb as they are already added by metadata
-            if self.jupyter_target_pdf and self.section_level == 1 and not self.in_topic:
-                self.markdown_lines = []
-                return
             self.markdown_lines.append(self.sep_paras)
 
     # emphasis(italic)
@@ -517,58 +453,18 @@ class JupyterTranslator(JupyterCodeTranslator, object):
     # reference
     def visit_reference(self, node):
         """anchor link"""
-        ## removing zreferences from the index file
-        if self.in_book_index and node.attributes['refuri'] == 'zreferences':
-            return
-
         self.in_reference = True
-        if self.jupyter_target_pdf:
-            if "refuri" in node and "http" in node["refuri"]:
-                self.markdown_lines.append("[")
-            elif "refid" in node:
-                if 'equation-' in node['refid']:
-                    self.markdown_lines.append("\eqref{")
-                elif self.in_topic:
-                    pass
-                else:
-                    self.markdown_lines.append("\hyperlink{")
-            elif "refuri" in node and 'references#' not in node["refuri"]:
-                self.markdown_lines.append("[")
-            else:
-                self.markdown_lines.append("\hyperlink{")
-        else:
-            self.markdown_lines.append("[")
+        self.markdown_lines.append("[")
         self.reference_text_start = len(self.markdown_lines)
 
     def depart_reference(self, node):
-        subdirectory = False
-
-        ## removing zreferences from the index file
-        if self.in_book_index and node.attributes['refuri'] == 'zreferences':
-            return
-
         if self.in_topic:
             # Jupyter Notebook uses the target text as its id
             uri_text = "".join(
                 self.markdown_lines[self.reference_text_start:]).strip()
             uri_text = re.sub(
                 self.URI_SPACE_REPLACE_FROM, self.URI_SPACE_REPLACE_TO, uri_text)
-            if self.jupyter_target_html:
-                #Adjust contents (toc) text when targetting html to prevent nbconvert from breaking html on )
-                uri_text = uri_text.replace("(", "%28")
-                uri_text = uri_text.replace(")", "%29")
-            #Format end of reference in topic
-            if self.jupyter_target_pdf:
-                uri_text = uri_text.lower()
-                SPECIALCHARS = [r"!", r"@", r"#", r"$", r"%", r"^", r"&", r"*", r"(", r")", r"[", r"]", r"{", 
-                                r"}", r"|", r":", r";", r",", r"?", r"'", r"’", r"–", r"`"]
-                for CHAR in SPECIALCHARS:
-                    uri_text = uri_text.replace(CHAR,"")
-                    uri_text = uri_text.replace("--","-")
-                    uri_text = uri_text.replace(".-",".")
-                formatted_text = " \\ref{" + uri_text + "}" #Use Ref and Plain Text titles
-            else:
-                formatted_text = "](#{})".format(uri_text)
+            formatted_text = "](#{})".format(self.topic_uri(uri_text))
             self.markdown_lines.append(formatted_text)
         else:
             # if refuri exists, then it includes id reference(#hoge)
@@ -576,48 +472,17 @@ class JupyterTranslator(JupyterCodeTranslator, object):
                 refuri = node["refuri"]
                 # add default extension(.ipynb)
                 if "internal" in node.attributes and node.attributes["internal"] == True:
-                    if self.jupyter_target_html:
-                        refuri = self.add_extension_to_inline_link(refuri, self.html_ext)
-                        ## add url path if it is set
-                        if self.urlpath is not None:
-                            refuri = self.urlpath + refuri
-                    elif self.jupyter_target_pdf and 'references#' in refuri:
-                        label = refuri.split("#")[-1]
-                        bibtex = self.markdown_lines.pop()
-                        if "hyperlink" in self.markdown_lines[-1]:
-                            self.markdown_lines.pop()
-                        refuri = "reference-\\cite{" + label
-                        self.add_bib_to_latex(self.output, True)
-                    elif self.jupyter_target_pdf and 'references' not in refuri:
-                        if self.source_file_name.split('/')[-2] and 'rst' not in self.source_file_name.split('/')[-2]:
-                            subdirectory = self.source_file_name.split('/')[-2]
-                        if subdirectory: refuri = subdirectory + "/" + refuri
-                        hashIndex = refuri.rfind("#")
-                        if hashIndex > 0:
-                            refuri = refuri[0:hashIndex] + ".html" + refuri[hashIndex:]
-                        else:
-                            refuri = refuri + ".html"
-                        if self.urlpath:
-                            self.markdown_lines.append("]({})".format(self.urlpath + refuri))
-                        else:
-                            self.markdown_lines.append("]({})".format(refuri))
-                    else:
-                        refuri = self.add_extension_to_inline_link(refuri, self.default_ext)
+                    refuri = self.internal_uri(refuri)
             else:
                 # in-page link
                 if "refid" in node:
                     refid = node["refid"]
                     self.in_inpage_reference = True
-                    if not self.jupyter_target_pdf:
-                        #markdown doesn't handle closing brackets very well so will replace with %28 and %29
-                        #ignore adjustment when targeting pdf as pandoc doesn't parse %28 correctly
-                        refid = refid.replace("(", "%28")
-                        refid = refid.replace(")", "%29")
-                    if self.jupyter_target_pdf:
-                        refuri = refid
-                    else:
-                        #markdown target
-                        refuri = "#{}".format(refid)
+                    #markdown doesn't handle closing brackets very well so will replace with %28 and %29
+                    refid = refid.replace("(", "%28")
+                    refid = refid.replace(")", "%29")
+                    #markdown target
+                    refuri = "#{}".format(refid)
                 # error
                 else:
                     self.error("Invalid reference")
@@ -625,88 +490,29 @@ class JupyterTranslator(JupyterCodeTranslator, object):
 
             #TODO: review if both %28 replacements necessary in this function?
             #      Propose delete above in-link refuri
-            if not self.jupyter_target_pdf:
-                #ignore adjustment when targeting pdf as pandoc doesn't parse %28 correctly
-                refuri = refuri.replace("(", "%28")  #Special case to handle markdown issue with reading first )
-                refuri = refuri.replace(")", "%29")
-            if self.jupyter_target_pdf and 'reference-' in refuri:
-                self.markdown_lines.append(refuri.replace("reference-","") + "}")
-            elif "refuri" in node.attributes and self.jupyter_target_pdf and "internal" in node.attributes and node.attributes["internal"] == True and "references" not in node["refuri"]:
-                ##### Below code, constructs an index file for the book
-                if self.in_book_index:
-                    if self.markdown_lines_trimmed != [] and (all(x in self.markdown_lines for x in self.markdown_lines_trimmed)): 
-                        ### when the list is not empty and when the list contains chapters or heading from the topic already
-                        self.markdown_lines_trimmed = self.markdown_lines[len(self.book_index_previous_links) + 2:] ### +2 to preserve '/n's
-                        if '- ' in self.markdown_lines[len(self.book_index_previous_links) + 1:]:
-                            text = "\\chapter{{{}}}\\input{{{}}}".format(node.astext(), node["refuri"] + ".tex")
-                        else:
-                            text = "\\cleardoublepage\\part{{{}}}".format(node.astext())
-                        self.markdown_lines = self.markdown_lines[:len(self.markdown_lines) - len(self.markdown_lines_trimmed)]
-                        self.markdown_lines.append(text)
-                        self.markdown_lines_trimmed = []
-                        self.markdown_lines_trimmed.append(text)
-                    else:
-                        ### when the list is empty the first entry is the topic
-                        text = "\\cleardoublepage\\part{{{}}}".format(node.astext())
-                        self.markdown_lines = []
-                        self.markdown_lines.append(text)
-                        self.markdown_lines_trimmed = copy.deepcopy(self.markdown_lines)
-                    self.book_index_previous_links = copy.deepcopy(self.markdown_lines)
-
-                    ## check to remove any '- ' left behind during the above operation
-                    if "- " in self.markdown_lines:
-                        self.markdown_lines.remove("- ")
-
-            elif "refuri" in node.attributes and self.jupyter_target_pdf and "http" in node["refuri"]:
-                ### handling extrernal links
-                self.markdown_lines.append("]({})".format(refuri))
-                #label = self.markdown_lines.pop()
-                # if "\href{" == label:  #no label just a url
-                #     self.markdown_lines.append(label + "{" + refuri + "}")
-                # else:
-                #     self.markdown_lines.append(refuri + "}" + "{" + label + "}")
-            elif self.jupyter_target_pdf and self.in_inpage_reference:
-                labeltext = self.markdown_lines.pop()
-                # Check for Equations as they do not need labetext
-                if 'equation-' in refuri:
-                    self.markdown_lines.append(refuri + "}")
-                else:
-                    self.markdown_lines.append(refuri + "}{" + labeltext + "}")
-            # if self.jupyter_target_pdf and self.in_toctree:
-            #     #TODO: this will become an internal link when making a single unified latex file
-            #     formatted_text = " \\ref{" + refuri + "}"
-            #     self.markdown_lines.append(formatted_text)
-            else:
-                self.markdown_lines.append("]({})".format(refuri))
+            refuri = refuri.replace("(", "%28")  #Special case to handle markdown issue with reading first )
+            refuri = refuri.replace(")", "%29")
+            self.markdown_lines.append("]({})".format(refuri))
 
         if self.in_toctree:
             self.markdown_lines.append("\n")
 
         self.in_reference = False
 
+    def topic_uri(self, uri_text):
+        return uri_text
+
+    def internal_uri(self, refuri):
+        return self.add_extension_to_inline_link(refuri, self.default_ext)
+
     # target: make anchor
     def visit_target(self, node):
         if "refid" in node.attributes:
             refid = node.attributes["refid"]
-            if self.jupyter_target_pdf:
-                if 'equation' in refid:
-                    #no html targets when computing notebook to target pdf in labelled math
-                    pass
-                else:
-                    #set hypertargets for non math targets
-                    if self.markdown_lines:
-                        self.markdown_lines.append("\n\\hypertarget{" + refid + "}{}\n\n")
-            else:
-                self.markdown_lines.append("\n<a id='{}'></a>\n".format(refid))
+            self.markdown_lines.append("\n<a id='{}'></a>\n".format(refid))
 
     # list items
     def visit_bullet_list(self, node):
-        ## trying to return if it is in the topmost depth and it is more than 1
-        if self.jupyter_target_pdf and (self.content_depth == self.jupyter_pdf_showcontentdepth) and self.content_depth > 1:
-            self.content_depth_to_skip = self.content_depth
-            self.initial_lines = []
-            return
-
         self.list_level += 1
 
         # markdown does not have option changing bullet chars
@@ -739,22 +545,6 @@ class JupyterTranslator(JupyterCodeTranslator, object):
             self.indents.pop()
 
     def visit_list_item(self, node):
-
-        ## do not add this list item to the list
-        if self.skip_next_content is True:
-           self.markdown_lines = copy.deepcopy(self.initial_lines)
-           self.skip_next_content = False
-        
-        ## if we do not want to add the items in this depth to the list
-        if self.content_depth == self.content_depth_to_skip:
-           self.initial_lines = copy.deepcopy(self.markdown_lines)
-           self.skip_next_content = True
-           self.content_depth_to_skip = None
-
-           ## only one item in this content depth to remove 
-           self.content_depth -= 1
-           return
-
         ## check if there is a list level
         if not len(self.bullets):
             return
@@ -849,10 +639,7 @@ class JupyterTranslator(JupyterCodeTranslator, object):
                 id_text += "{} ".format(id_)
             else:
                 id_text = id_text[:-1]
-            if self.jupyter_target_html:
-                self.markdown_lines.append("<p><a id={} href=#{}-link><strong>[{}]</strong></a> ".format(id_text, id_text, node.astext()))
-            else:
-                self.markdown_lines.append("<a id='{}'></a>\n**[{}]** ".format(id_text, node.astext()))
+            self.markdown_lines.append(self.footnote_label(id_text, node.astext()))
             raise nodes.SkipNode
         if self.in_citation:
             self.markdown_lines.append("\[")
@@ -861,6 +648,9 @@ class JupyterTranslator(JupyterCodeTranslator, object):
         if self.in_citation:
             self.markdown_lines.append("\] ")
 
+    def footnote_label(self, id_text, text):
+        return "<a id='{}'></a>\n**[{}]** ".format(id_text, text)
+
     # ===============================================
     #  code blocks are implemented in the superclass
     # ===============================================
@@ -895,11 +685,6 @@ class JupyterTranslator(JupyterCodeTranslator, object):
         self.in_note = False
 
     def depart_raw(self, node):
-        if self.jupyter_target_pdf:
-            for attr in node.attributes:
-                if attr == 'format' and node.attributes[attr] == 'html':
-                    self.markdown_lines = []
-                    return
         self.markdown_lines.append("\n\n")
         
 
@@ -973,7 +758,7 @@ class JupyterTranslator(JupyterCodeTranslator, object):
         slide_info = {'slide_type': self.slide}
 
         if len(formatted_line_text.strip()) > 0:
-            new_md_cell = nbformat.v4.new_markdown_cell(formatted_line_text)
+            new_md_cell = new_markdown_cell(formatted_line_text)
             if self.metadata_slide:  # modify the slide metadata on each cell
                 new_md_cell.metadata["slideshow"] = slide_info
                 self.slide = slide_type
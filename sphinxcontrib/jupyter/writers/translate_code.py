@@ -1,23 +1,36 @@
 import docutils.nodes
 import re
 import nbformat.v4
-import os.path
 import datetime
-from .utils import LanguageTranslator, JupyterOutputCellGenerators, get_source_file_name
+from .utils import JupyterOutputCellGenerators, get_source_file_name, get_language_translator, get_header_block, new_markdown_cell
+
+
+def node_classes(node_class=docutils.nodes.Node):
+    ## the node classes defined so far (by docutils, sphinx and the extensions)
+    for subclass in node_class.__subclasses__():
+        yield subclass
+        for descendant in node_classes(subclass):
+            yield descendant
+
 
 class JupyterCodeTranslator(docutils.nodes.GenericNodeVisitor):
 
     URI_SPACE_REPLACE_FROM = re.compile(r"\s")
     URI_SPACE_REPLACE_TO = "-"
 
+    ## visit and departure handlers of each translator class, by node class
+    _handler_tables = dict()
+
     def __init__(self, builder, document):
         docutils.nodes.NodeVisitor.__init__(self, document)
+        self.visit_handlers = self.handler_table('visit_')
+        self.departure_handlers = self.handler_table('depart_')
 
         self.lang = None
         self.nodelang = None
         self.visit_first_title = True
 
-        self.langTranslator = LanguageTranslator(builder.config["templates_path"])
+        self.langTranslator = get_language_translator(builder.config["templates_path"])
 
         # Reporter
         self.warn = self.document.reporter.warning
@@ -59,23 +72,12 @@ class JupyterCodeTranslator(docutils.nodes.GenericNodeVisitor):
 
 
         # Header Block
-        template_paths = builder.config["templates_path"]
-        header_block_filename = builder.config["jupyter_header_block"]
+        line_text = get_header_block(builder.config["templates_path"], builder.config["jupyter_header_block"])
 
-        full_path_to_header_block = None
-        for template_path in template_paths:
-            if header_block_filename:
-                if os.path.isfile(template_path + "/" + header_block_filename):
-                   full_path_to_header_block = os.path.normpath( template_path + "/" + header_block_filename)
-
-        if full_path_to_header_block:
-            with open(full_path_to_header_block) as input_file:
-                lines = input_file.readlines()
-
-            line_text = "".join(lines)
+        if line_text is not None:
             formatted_line_text = self.strip_blank_lines_in_end_of_block(
                 line_text)
-            nb_header_block = nbformat.v4.new_markdown_cell(
+            nb_header_block = new_markdown_cell(
                 formatted_line_text)
 
             # Add the header block to the output stream straight away
@@ -92,13 +94,77 @@ class JupyterCodeTranslator(docutils.nodes.GenericNodeVisitor):
                 self.source_file_name)
 
             self.output["cells"].append(
-                nbformat.v4.new_markdown_cell(metadata))
+                new_markdown_cell(metadata))
 
         # Variables used in visit/depart
         self.in_code_block = False  # if False, it means in markdown_cell
         self.output_cell_type = None
         self.code_lines = []
 
+    # dispatch
+    # --------
+    # The handlers of the node classes are resolved when the first translator of a class
+    # (which JupyterWriter picks from the configuration of the targets) is created, and
+    # kept in a table, instead of the getattr and debug message of GenericNodeVisitor on
+    # every visit. Node classes defined afterwards are resolved on their first visit.
+
+    @classmethod
+    def handler_table(cls, prefix):
+        key = (cls, prefix)
+        if key not in cls._handler_tables:
+            cls._handler_tables[key] = dict((node_class, cls.resolve_handler(prefix, node_class))
+                                            for node_class in node_classes())
+        return cls._handler_tables[key]
+
+    @classmethod
+    def resolve_handler(cls, prefix, node_class):
+        name = prefix + node_class.__name__
+        handler = getattr(cls, name, None)
+        if handler is None:
+            return cls.unknown_visit if prefix == 'visit_' else cls.unknown_departure
+        if handler is getattr(docutils.nodes.GenericNodeVisitor, name, None):
+            handler = cls.default_visit if prefix == 'visit_' else cls.default_departure
+        return handler
+
+    def dispatch_visit(self, node):
+        try:
+            handler = self.visit_handlers[node.__class__]
+        except KeyError:
+            handler = self.visit_handlers[node.__class__] = self.resolve_handler('visit_', node.__class__)
+        return handler(self, node)
+
+    def dispatch_departure(self, node):
+        try:
+            handler = self.departure_handlers[node.__class__]
+        except KeyError:
+            handler = self.departure_handlers[node.__class__] = self.resolve_handler('depart_', node.__class__)
+        return handler(self, node)
+
+    # translation
+    # -----------
+    # In code mode only the titles, code blocks and highlight language of a document
+    # are translated, so rather than walking every node of the doctree only those
+    # nodes are visited. The text of a code block is the text of its Text nodes.
+    code_node_names = frozenset(['title', 'literal_block', 'highlightlang'])
+
+    def translate_document(self, document):
+        self.visit_document(document)
+        for node in document.findall(self.is_code_node):
+            name = node.__class__.__name__
+            if name == 'literal_block':
+                self.visit_literal_block(node)
+                self.code_lines.append(node.astext())
+                self.depart_literal_block(node)
+            elif name == 'title':
+                self.visit_title(node)
+            else:
+                self.visit_highlightlang(node)
+        self.depart_document(document)
+
+    @classmethod
+    def is_code_node(cls, node):
+        return node.__class__.__name__ in cls.code_node_names
+
     # generic visit and depart methods
     # --------------------------------
     simple_nodes = (
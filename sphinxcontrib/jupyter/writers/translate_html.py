@@ -0,0 +1,28 @@
+from __future__ import unicode_literals
+from .translate_all import JupyterTranslator
+
+
+class JupyterHTMLTranslator(JupyterTranslator):
+    """ Jupyter Translator for notebooks that are converted to html (jupyter_target_html)
+
+    Links to other documents point to their html pages and footnotes get back references
+    """
+
+    def topic_uri(self, uri_text):
+        #Adjust contents (toc) text when targetting html to prevent nbconvert from breaking html on )
+        uri_text = uri_text.replace("(", "%28")
+        uri_text = uri_text.replace(")", "%29")
+        return uri_text
+
+    def internal_uri(self, refuri):
+        refuri = self.add_extension_to_inline_link(refuri, self.html_ext)
+        ## add url path if it is set
+        if self.urlpath is not None:
+            refuri = self.urlpath + refuri
+        return refuri
+
+    def footnote_link(self, refid, ids):
+        return "<sup><a href=#{} id={}-link>[{}]</a></sup>".format(refid, refid, ids)
+
+    def footnote_label(self, id_text, text):
+        return "<p><a id={} href=#{}-link><strong>[{}]</strong></a> ".format(id_text, id_text, text)
@@ -0,0 +1,308 @@
+from __future__ import unicode_literals
+import re
+import copy
+from docutils import nodes
+from .book_index import BookIndex
+from .translate_code import JupyterCodeTranslator
+from .translate_all import JupyterTranslator
+
+
+class JupyterPDFTranslator(JupyterTranslator):
+    """ Jupyter Translator for notebooks that are converted to latex (jupyter_target_pdf)
+
+    References, targets and math labels are written as latex, the main title is left
+    to the notebook metadata and the contents list is limited to jupyter_pdf_showcontentdepth.
+    When building a book (jupyter_pdf_book) the index document is translated to the parts
+    and chapters of the book.
+    """
+
+    #must remove spaces between $ and math for latex
+    INLINE_MATH_FORMAT = "${}$"
+
+    def __init__(self, builder, document):
+        super(JupyterPDFTranslator, self).__init__(builder, document)
+        self.skip_next_content = False
+        self.content_depth = self.jupyter_pdf_showcontentdepth
+        self.content_depth_to_skip = None
+
+        ## pdf book options
+        self.in_book_index = False
+        self.book_index_builder = BookIndex()
+
+    def visit_document(self, node):
+        """at start
+        """
+        JupyterTranslator.visit_document(self, node)
+
+        ## if the source file parsed is book index file
+        if self.book_index is not None and self.book_index in self.source_file_name and self.jupyter_pdf_book:
+            self.in_book_index = True
+
+    def depart_document(self, node):
+        if self.in_book_index:
+            ## the index notebook of the book only holds the parts and chapters of the book
+            self.markdown_lines = [self.book_index_builder.latex()]
+            self.output["cells"] = [cell for cell in self.output["cells"] if cell.cell_type != "markdown"]
+        JupyterTranslator.depart_document(self, node)
+
+    #=================
+    # Inline elements
+    #=================
+    def visit_image(self, node):
+        ### preventing image from the index file at the moment
+        if self.in_book_index:
+            return
+        JupyterTranslator.visit_image(self, node)
+
+    def depart_image(self, node):
+        self.markdown_lines.append("\n")
+
+    def math_label(self, node):
+        #Use \tags in the LaTeX environment
+        if "ids" in node and len(node["ids"]):
+            #pdf should have label following tag and removed html id tags in visit_target
+            return " \\tag{" + str(node["number"]) + "}" + "\\label{" + node["ids"][0] + "}\n"
+        return JupyterTranslator.math_label(self, node)
+
+    #================
+    # markdown cells
+    #================
+
+    # title(section)
+    def visit_title(self, node):
+        if self.in_book_index and self.in_toctree:
+            self.visit_caption(node)
+
+        JupyterCodeTranslator.visit_title(self, node)
+
+        ### to remove the main title from ipynb as they are already added by metadata
+        if self.section_level == 1 and not self.in_topic:
+            return
+        else:
+            self.add_markdown_cell()
+        if self.in_topic:
+            ### this prevents from making it a subsection from section
+            if self.section_level == 1:
+                self.markdown_lines.append(
+                    "{} ".format("#" * (self.section_level)))
+            else:
+                self.markdown_lines.append(
+                    "{} ".format("#" * (self.section_level + 1)))
+        elif self.table_builder:
+            self.markdown_lines.append(
+                "### {}\n".format(node.astext()))
+        else:
+            ### this makes all the sections go up one level to transform subsections to sections
+            self.markdown_lines.append(
+                "{} ".format("#" * (self.section_level -1)))
+
+    def depart_title(self, node):
+        if not self.table_builder:
+
+            ### to remove the main title from ipynb as they are already added by metadata
+            if self.section_level == 1 and not self.in_topic:
+                self.markdown_lines = []
+                return
+            self.markdown_lines.append(self.sep_paras)
+
+    # reference
+    def visit_reference(self, node):
+        """anchor link"""
+        if self.in_book_index:
+            ## toctree entries of the index file are the parts and chapters of the book
+            for cls in node.parent.get('classes', []):
+                if cls.startswith('toctree-l') and "refuri" in node:
+                    self.book_index_builder.add_entry(int(cls[len('toctree-l'):]), node.astext(), node["refuri"])
+            raise nodes.SkipNode
+
+        self.in_reference = True
+        if "refuri" in node and "http" in node["refuri"]:
+            self.markdown_lines.append("[")
+        elif "refid" in node:
+            if 'equation-' in node['refid']:
+                self.markdown_lines.append("\\eqref{")
+            elif self.in_topic:
+                pass
+            else:
+                self.markdown_lines.append("\\hyperlink{")
+        elif "refuri" in node and 'references#' not in node["refuri"]:
+            self.markdown_lines.append("[")
+        else:
+            self.markdown_lines.append("\\hyperlink{")
+        self.reference_text_start = len(self.markdown_lines)
+
+    def depart_reference(self, node):
+        if self.in_topic:
+            # Jupyter Notebook uses the target text as its id
+            uri_text = "".join(
+                self.markdown_lines[self.reference_text_start:]).strip()
+            uri_text = re.sub(
+                self.URI_SPACE_REPLACE_FROM, self.URI_SPACE_REPLACE_TO, uri_text)
+            uri_text = self.topic_uri(uri_text)
+            #Format end of reference in topic
+            uri_text = uri_text.lower()
+            SPECIALCHARS = [r"!", r"@", r"#", r"$", r"%", r"^", r"&", r"*", r"(", r")", r"[", r"]", r"{",
+                            r"}", r"|", r":", r";", r",", r"?", r"'", r"’", r"–", r"`"]
+            for CHAR in SPECIALCHARS:
+                uri_text = uri_text.replace(CHAR,"")
+                uri_text = uri_text.replace("--","-")
+                uri_text = uri_text.replace(".-",".")
+            formatted_text = " \\ref{" + uri_text + "}" #Use Ref and Plain Text titles
+            self.markdown_lines.append(formatted_text)
+        else:
+            # if refuri exists, then it includes id reference(#hoge)
+            if "refuri" in node.attributes:
+                refuri = node["refuri"]
+                # add default extension(.ipynb)
+                if "internal" in node.attributes and node.attributes["internal"] == True:
+                    refuri = self.internal_uri(refuri)
+            else:
+                # in-page link
+                if "refid" in node:
+                    refid = node["refid"]
+                    self.in_inpage_reference = True
+                    #no %28 and %29 adjustment as pandoc doesn't parse %28 correctly
+                    refuri = refid
+                # error
+                else:
+                    self.error("Invalid reference")
+                    refuri = ""
+
+            if 'reference-' in refuri:
+                self.markdown_lines.append(refuri.replace("reference-","") + "}")
+            elif "refuri" in node.attributes and "internal" in node.attributes and node.attributes["internal"] == True and "references" not in node["refuri"]:
+                ## the end of the link is added above
+                pass
+
+            elif "refuri" in node.attributes and "http" in node["refuri"]:
+                ### handling extrernal links
+                self.markdown_lines.append("]({})".format(refuri))
+            elif self.in_inpage_reference:
+                labeltext = self.markdown_lines.pop()
+                # Check for Equations as they do not need labetext
+                if 'equation-' in refuri:
+                    self.markdown_lines.append(refuri + "}")
+                else:
+                    self.markdown_lines.append(refuri + "}{" + labeltext + "}")
+            else:
+                self.markdown_lines.append("]({})".format(refuri))
+
+        if self.in_toctree:
+            self.markdown_lines.append("\n")
+
+        self.in_reference = False
+
+    def internal_uri(self, refuri):
+        ## citations are written as latex, and links to the other documents point to their
+        ## html pages (the end of the link is added here)
+        if 'references#' in refuri:
+            label = refuri.split("#")[-1]
+            self.markdown_lines.pop()
+            if "hyperlink" in self.markdown_lines[-1]:
+                self.markdown_lines.pop()
+            self.add_bib_to_latex(self.output, True)
+            return "reference-\\cite{" + label
+        if 'references' in refuri:
+            return self.add_extension_to_inline_link(refuri, self.default_ext)
+
+        subdirectory = False
+        if self.source_file_name.split('/')[-2] and 'rst' not in self.source_file_name.split('/')[-2]:
+            subdirectory = self.source_file_name.split('/')[-2]
+        if subdirectory: refuri = subdirectory + "/" + refuri
+        hashIndex = refuri.rfind("#")
+        if hashIndex > 0:
+            refuri = refuri[0:hashIndex] + ".html" + refuri[hashIndex:]
+        else:
+            refuri = refuri + ".html"
+        if self.urlpath:
+            self.markdown_lines.append("]({})".format(self.urlpath + refuri))
+        else:
+            self.markdown_lines.append("]({})".format(refuri))
+        return refuri
+
+    def visit_compact_paragraph(self, node):
+        if self.in_book_index and node.get('toctree'):
+            self.book_index_builder.start_toctree()
+        JupyterTranslator.visit_compact_paragraph(self, node)
+
+    def visit_caption(self, node):
+        if self.in_book_index and self.in_toctree:
+            ## a toctree caption is a part of the book
+            self.book_index_builder.add_caption(node.astext())
+            raise nodes.SkipNode
+        JupyterTranslator.visit_caption(self, node)
+
+    # target: make anchor
+    def visit_target(self, node):
+        if "refid" in node.attributes:
+            refid = node.attributes["refid"]
+            if 'equation' in refid:
+                #no html targets when computing notebook to target pdf in labelled math
+                pass
+            else:
+                #set hypertargets for non math targets
+                if self.markdown_lines:
+                    self.markdown_lines.append("\n\\hypertarget{" + refid + "}{}\n\n")
+
+    # list items
+    def visit_bullet_list(self, node):
+        ## trying to return if it is in the topmost depth and it is more than 1
+        if (self.content_depth == self.jupyter_pdf_showcontentdepth) and self.content_depth > 1:
+            self.content_depth_to_skip = self.content_depth
+            self.initial_lines = []
+            return
+        JupyterTranslator.visit_bullet_list(self, node)
+
+    def visit_list_item(self, node):
+
+        ## do not add this list item to the list
+        if self.skip_next_content is True:
+           self.markdown_lines = copy.deepcopy(self.initial_lines)
+           self.skip_next_content = False
+
+        ## if we do not want to add the items in this depth to the list
+        if self.content_depth == self.content_depth_to_skip:
+           self.initial_lines = copy.deepcopy(self.markdown_lines)
+           self.skip_next_content = True
+           self.content_depth_to_skip = None
+
+           ## only one item in this content depth to remove
+           self.content_depth -= 1
+           return
+
+        JupyterTranslator.visit_list_item(self, node)
+
+    def depart_raw(self, node):
+        for attr in node.attributes:
+            if attr == 'format' and node.attributes[attr] == 'html':
+                self.markdown_lines = []
+                return
+        JupyterTranslator.depart_raw(self, node)
+
+
+class JupyterPDFHTMLTranslator(JupyterPDFTranslator):
+    """ Jupyter Translator for notebooks that are converted to latex and html (jupyter_target_pdf
+    and jupyter_target_html)
+
+    The latex notebook with the html formats of the contents, links to other documents and
+    footnotes
+    """
+
+    def topic_uri(self, uri_text):
+        #Adjust contents (toc) text when targetting html to prevent nbconvert from breaking html on )
+        uri_text = uri_text.replace("(", "%28")
+        uri_text = uri_text.replace(")", "%29")
+        return uri_text
+
+    def internal_uri(self, refuri):
+        refuri = self.add_extension_to_inline_link(refuri, self.html_ext)
+        ## add url path if it is set
+        if self.urlpath is not None:
+            refuri = self.urlpath + refuri
+        return refuri
+
+    def footnote_link(self, refid, ids):
+        return "<sup><a href=#{} id={}-link>[{}]</a></sup>".format(refid, refid, ids)
+
+    def footnote_label(self, id_text, text):
+        return "<p><a id={} href=#{}-link><strong>[{}]</strong></a> ".format(id_text, id_text, text)
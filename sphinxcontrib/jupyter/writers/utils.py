@@ -2,6 +2,7 @@ import os.path
 import os
 import sys
 import nbformat.v4
+from nbformat import NotebookNode
 from xml.etree.ElementTree import ElementTree
 from enum import Enum
 from sphinx.util.osutil import ensuredir
@@ -10,6 +11,12 @@ from shutil import copy
 if sys.version_info.major == 2:
     import fnmatch
 
+try:
+    # nbformat >= 5.1 gives cell ids
+    from nbformat.v4.nbbase import random_cell_id
+except ImportError:
+    random_cell_id = None
+
 class LanguageTranslator:
     """
     Simple extensible translator for programming language names between Sphinx
@@ -65,6 +72,81 @@ class LanguageTranslator:
         return self.translator[language_name] if language_name in self.translator else language_name
 
 
+## files read from the template paths, kept for the whole build in each process
+_template_files_cache = dict()
+
+def _file_signature(path):
+    ## modification time and size of a file, or None if it does not exist
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+def _cached(key, paths, load):
+    ## returns the value produced by load(), computed again only when one of the paths changes
+    signature = tuple(_file_signature(path) for path in paths)
+    cached = _template_files_cache.get(key)
+    if cached is None or cached[0] != signature:
+        cached = (signature, load())
+        _template_files_cache[key] = cached
+    return cached[1]
+
+def get_language_translator(template_paths):
+    """
+    Returns the LanguageTranslator for `template_paths`, shared by all the documents 
+    of the build. It is created again when a languages.xml file is added, changed 
+    or removed. The shared translator must not be modified.
+    """
+    template_paths = tuple(template_paths)
+    paths = [os.path.normpath(path + "/languages.xml") for path in template_paths]
+    return _cached(('languages', template_paths), paths, lambda: LanguageTranslator(template_paths))
+
+def get_header_block(template_paths, header_block_filename):
+    """
+    Returns the text of the header block file (jupyter_header_block) found in
+    `template_paths`, or None. The file is read again only when it changes.
+    """
+    if not header_block_filename:
+        return None
+    template_paths = tuple(template_paths)
+    paths = [template_path + "/" + header_block_filename for template_path in template_paths]
+
+    def load():
+        full_path_to_header_block = None
+        for path in paths:
+            if os.path.isfile(path):
+                full_path_to_header_block = os.path.normpath(path)
+        if full_path_to_header_block is None:
+            return None
+        with open(full_path_to_header_block) as input_file:
+            return "".join(input_file.readlines())
+
+    return _cached(('header_block', template_paths, header_block_filename), paths, load)
+
+
+def _new_cell(cell_type, source, **fields):
+    cell = NotebookNode(cell_type=cell_type, metadata=NotebookNode(), source=source, **fields)
+    if random_cell_id is not None:
+        cell['id'] = random_cell_id()
+    return cell
+
+def new_code_cell(source):
+    """
+    Creates a code cell as nbformat.v4.new_code_cell does, without validating each cell
+    against the notebook schema: JupyterWriter validates the whole notebook once before
+    it is written
+    """
+    return _new_cell("code", source, execution_count=None, outputs=[])
+
+def new_markdown_cell(source):
+    """
+    Creates a markdown cell as nbformat.v4.new_markdown_cell does, without validating it
+    (see `new_code_cell`)
+    """
+    return _new_cell("markdown", source)
+
+
 class JupyterOutputCellGenerators(Enum):
     CODE = 1
     MARKDOWN = 2
@@ -106,7 +188,7 @@ class JupyterOutputCellGenerators(Enum):
         Generates the Jupyter cell object.
         """
         if self is JupyterOutputCellGenerators.CODE:
-            res = nbformat.v4.new_code_cell(formatted_text)
+            res = new_code_cell(formatted_text)
         elif self is JupyterOutputCellGenerators.CODE_OUTPUT:
             res = nbformat.v4.new_output(output_type="stream", text=formatted_text)
         elif self is JupyterOutputCellGenerators.MARKDOWN:
@@ -117,7 +199,7 @@ class JupyterOutputCellGenerators(Enum):
                 raw_markdown = "```" + "text" + "\n" + formatted_text + "\n```\n"
             else:
                 raw_markdown = "```" + language + "\n" + formatted_text + "\n```\n"
-            res = nbformat.v4.new_markdown_cell(raw_markdown)
+            res = new_markdown_cell(raw_markdown)
         else:
             raise Exception("Invalid output cell type passed to JupyterOutputCellGenerator.Generate.")
 
@@ -137,6 +219,18 @@ def get_source_file_name(filepath, srcdir):
     return "/".join(file_name_list) # Does this also need to be changed?
 
 
+def config_number(config, name, convert = int):
+    """
+    Returns the number of a config value which defaults to None (disabled). Sphinx only
+    converts the values given with `-D name=value` to the type of the default, so the
+    strings are converted here.
+    """
+    value = config[name]
+    if value is None or value == "":
+        return None
+    return convert(value)
+
+
 def _str_to_lines(x):
     if isinstance(x, str):
         return list(map(lambda y: y.strip() + "\n", x.splitlines()))
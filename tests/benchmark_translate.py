@@ -0,0 +1,168 @@
+"""
+Translation Benchmark
+
+Generates a large synthetic RST document, reads it with sphinx and measures
+the throughput (nodes per second) of walking the resolved doctree with the
+jupyter translators, for each target (plain notebooks, html and pdf).
+
+The translators dispatch nodes through a table of handlers; for comparison
+the same translators are also timed with the getattr based dispatch of
+docutils.nodes.GenericNodeVisitor. In code mode, the translation that only
+visits titles and code blocks is also compared with a walk of the full doctree.
+
+With --corpus, the documents of an existing project (such as base) are
+translated instead of the synthetic document.
+
+Usage: python benchmark_translate.py [--sections 200] [--repeat 5] [--mode all] [--corpus base]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import docutils.nodes
+from sphinx.application import Sphinx
+from sphinxcontrib.jupyter.writers.jupyter import JupyterWriter
+
+CONF = """
+extensions = ['sphinxcontrib.jupyter']
+master_doc = 'index'
+jupyter_kernels = {
+    "python3": {
+        "kernelspec": {"display_name": "Python", "language": "python3", "name": "python3"},
+        "file_extension": ".py",
+    },
+}
+jupyter_lang_synonyms = ["python"]
+jupyter_write_metadata = False
+"""
+
+SECTION = """
+Section {0}
+===========
+
+A paragraph with *emphasis*, **strong text**, ``literal text``, inline math
+:math:`\\alpha_{0} + \\beta` and a link to `an external site <https://example.com/{0}>`__.
+A reference to :ref:`the first section <section-0>` and a footnote [#f{0}]_.
+
+- a bullet item with `a link <https://example.com>`__
+- a second item with :math:`x^{0}`
+
+  #. a nested enumerated item
+  #. another one
+
+.. math::
+    :label: eq{0}
+
+    \\int_0^{0} x \\, dx
+
+.. code-block:: python
+
+    x = {0}
+    print(x ** 2)
+
+.. note::
+
+    A note with some text in section {0}.
+
++--------+--------+
+| Header | Value  |
++========+========+
+| a      | {0}    |
++--------+--------+
+
+.. [#f{0}] The footnote of section {0}.
+
+"""
+
+
+def make_project(sections):
+    srcdir = tempfile.mkdtemp(prefix="jupyter-benchmark-")
+    with open(os.path.join(srcdir, "conf.py"), "w") as f:
+        f.write(CONF)
+    with open(os.path.join(srcdir, "index.rst"), "w") as f:
+        f.write("Benchmark\n=========\n\n")
+        for index in range(sections):
+            f.write(".. _section-{}:\n".format(index))
+            f.write(SECTION.format(index))
+    return srcdir
+
+
+def generic_dispatch(translator_class):
+    ## the translator with the dispatch of docutils.nodes.GenericNodeVisitor
+    return type("Generic" + translator_class.__name__, (translator_class,), {
+        'dispatch_visit': docutils.nodes.NodeVisitor.dispatch_visit,
+        'dispatch_departure': docutils.nodes.NodeVisitor.dispatch_departure,
+    })
+
+
+def walk(visitor, document):
+    document.walkabout(visitor)
+
+
+def translate(visitor, document):
+    visitor.translate_document(document)
+
+
+def benchmark(srcdir, target, mode, repeat):
+    overrides = {'jupyter_conversion_mode': mode}
+    if target == 'html':
+        overrides['jupyter_target_html'] = True
+    elif target == 'pdf':
+        overrides['jupyter_target_pdf'] = True
+    outdir = os.path.join(srcdir, "_build", target)
+    app = Sphinx(srcdir, srcdir, outdir, os.path.join(outdir, ".doctrees"), "jupyter",
+                 confoverrides=overrides, status=None, warning=None, freshenv=True)
+    ## only read the sources, the translators are run below
+    builder = app.builder
+    builder.read()
+    doctrees = [app.env.get_and_resolve_doctree(docname, builder) for docname in sorted(app.env.found_docs)]
+    num_nodes = sum(1 for doctree in doctrees for node in doctree.findall())
+
+    writer = JupyterWriter(builder)
+    writer._set_ref_urlpath(None)
+    writer._set_jupyter_download_nb_image_urlpath(None)
+    translator_class = writer.translator_class
+    variants = [('table', translator_class, walk), ('generic', generic_dispatch(translator_class), walk)]
+    if mode == 'code':
+        variants.insert(0, ('code', translator_class, translate))
+
+    results = []
+    for name, cls, run_translation in variants:
+        best = None
+        for run in range(repeat):
+            documents = [doctree.deepcopy() for doctree in doctrees]
+            start = time.perf_counter()
+            for document in documents:
+                run_translation(cls(builder, document), document)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append((name, best))
+
+    print("{} ({} documents, {} nodes, {} mode)".format(target, len(doctrees), num_nodes, mode))
+    for name, elapsed in results:
+        print("    {:8s} {:8.1f} ms {:12.0f} nodes/s {:6.2f}x".format(
+            name, elapsed * 1000, num_nodes / elapsed, results[-1][1] / elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the jupyter translators")
+    parser.add_argument("--sections", type=int, default=200, help="number of sections in the synthetic document")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs, the best is reported")
+    parser.add_argument("--mode", default="all", choices=["all", "code"], help="jupyter_conversion_mode")
+    parser.add_argument("--corpus", default=None, help="project to translate instead of the synthetic document")
+    args = parser.parse_args()
+
+    if args.corpus:
+        ## build in a copy so the project is left untouched
+        srcdir = tempfile.mkdtemp(prefix="jupyter-benchmark-")
+        shutil.rmtree(srcdir)
+        shutil.copytree(args.corpus, srcdir, ignore=shutil.ignore_patterns("_build*"))
+    else:
+        srcdir = make_project(args.sections)
+    try:
+        for target in ['plain', 'html', 'pdf']:
+            benchmark(srcdir, target, args.mode, args.repeat)
+    finally:
+        shutil.rmtree(srcdir)
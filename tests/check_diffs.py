@@ -7,6 +7,10 @@ Currently this is setup to ignore metadata as the extension will generate
 a minimal notebook. So opening a notebook and saving will add metadata
 that will cause the diff checker to fail.
 
+With --parallel, the notebooks built with parallel reads (make parallel-test)
+are checked against the notebooks of the serial build instead of the
+reference notebooks in ipynb/.
+
 """
 
 import nbformat
@@ -26,6 +30,9 @@ CONFIGSETS = {
     'pdf'   : "jupyterpdf",
     'no_inline_exercises' : "jupyter",
 }
+PARALLEL_CONFIGSETS = {
+    'base'  : "jupyter",
+}
 
 #-Diff Configuration-#
 NB_VERSION = 4
@@ -44,17 +51,25 @@ def python27_glob(path, pattern):
             matches.append(os.path.join(root, filename))
     return matches
 
-def check_set(PATH, BUILDER):
+def strip_cell_ids(nb):
+    #cell ids are random for each build
+    for cell in nb.cells:
+        cell.pop("id", None)
+    return nb
+
+def check_set(PATH, BUILDER, BUILDDIR="_build", REFDIR="ipynb"):
     if sys.version_info.major == 2:
-        GENERATED_IPYNB_FILES = python27_glob(PATH+"/_build/" + BUILDER + "/", "*.ipynb")
+        GENERATED_IPYNB_FILES = python27_glob(PATH+"/" + BUILDDIR + "/" + BUILDER + "/", "*.ipynb")
         GENERATED_IPYNB_FILES = [fl for fl in GENERATED_IPYNB_FILES if "/executed/" not in fl]      #Only compare Generated Versions (not Executed)
-        ref_files = python27_glob(PATH + "/ipynb/", "*.ipynb")
-        REFERENCE_IPYNB_FILES = [fl.split("ipynb/")[-1] for fl in ref_files] 
+        ref_files = python27_glob(PATH + "/" + REFDIR + "/", "*.ipynb")
+        ref_files = [fl for fl in ref_files if "/executed/" not in fl]
+        REFERENCE_IPYNB_FILES = [fl.split(REFDIR + "/")[-1] for fl in ref_files]
     else:
-        GENERATED_IPYNB_FILES = glob.glob(PATH + "/_build/" + BUILDER + "/**/*.ipynb", recursive=True)
+        GENERATED_IPYNB_FILES = glob.glob(PATH + "/" + BUILDDIR + "/" + BUILDER + "/**/*.ipynb", recursive=True)
         GENERATED_IPYNB_FILES = [fl for fl in GENERATED_IPYNB_FILES if "/executed/" not in fl]      #Only compare Generated Versions (not Executed)
-        ref_files = glob.glob(PATH + "/ipynb/**/*.ipynb", recursive=True)
-        REFERENCE_IPYNB_FILES = [fl.split("ipynb/")[-1] for fl in ref_files]
+        ref_files = glob.glob(PATH + "/" + REFDIR + "/**/*.ipynb", recursive=True)
+        ref_files = [fl for fl in ref_files if "/executed/" not in fl]
+        REFERENCE_IPYNB_FILES = [fl.split(REFDIR + "/")[-1] for fl in ref_files]
     failed = 0
     for fl in GENERATED_IPYNB_FILES:
         flname = fl.split(BUILDER + "/")[-1]
@@ -72,23 +87,32 @@ def check_set(PATH, BUILDER):
         else:
             print("Testing {} ...".format(fl))
             if flname not in REFERENCE_IPYNB_FILES:
-                print("[FAIL] Notebook {} has no matching test case in ipynb/".format(flname))
+                print("[FAIL] Notebook {} has no matching test case in {}/".format(flname, REFDIR))
                 failed += 1
                 continue
-            nb1 = nbformat.read(fl, NB_VERSION)
-            nb2 = nbformat.read(os.path.join(PATH+"/ipynb", flname), NB_VERSION)
+            nb1 = strip_cell_ids(nbformat.read(fl, NB_VERSION))
+            nb2 = strip_cell_ids(nbformat.read(os.path.join(PATH + "/" + REFDIR, flname), NB_VERSION))
             diff = diff_notebooks(nb1, nb2)
             if len(diff) != 0:
                 print("[FAIL] {} and {} are different:".format(
-                    fl, os.path.join("ipynb", flname)))
+                    fl, os.path.join(REFDIR, flname)))
                 print(diff)
                 failed += 1
     return failed
 
 #-Main-#
-for configset in CONFIGSETS:
-    print("Testing Configuration Set: {}".format(configset))
-    builder = CONFIGSETS[configset]
-    failed = check_set(configset, builder)
-    if failed != 0:
-        exit(failed)
+if "--parallel" in sys.argv:
+    ## parallel reads (sphinx-build -j) must build the same notebooks as a serial build
+    for configset in PARALLEL_CONFIGSETS:
+        print("Testing Configuration Set: {} (parallel build)".format(configset))
+        builder = PARALLEL_CONFIGSETS[configset]
+        failed = check_set(configset, builder, BUILDDIR="_build_parallel", REFDIR="_build/" + builder)
+        if failed != 0:
+            exit(failed)
+else:
+    for configset in CONFIGSETS:
+        print("Testing Configuration Set: {}".format(configset))
+        builder = CONFIGSETS[configset]
+        failed = check_set(configset, builder)
+        if failed != 0:
+            exit(failed)
@@ -0,0 +1,66 @@
+"""
+ExecutionHistory and the trends detected by TrendDetector
+"""
+
+from sphinxcontrib.jupyter.writers.execution_history import ExecutionHistory, TrendDetector, median
+
+
+def notebook(filename, runtime, num_errors=0, cells=None):
+    return {'filename': filename, 'language': 'python', 'runtime': runtime, 'num_errors': num_errors,
+            'peak_rss': None, 'cells': cells or {}}
+
+
+def record(build_id, *notebooks):
+    return {'build_id': build_id, 'run_time': "", 'notebooks': list(notebooks)}
+
+
+def test_median():
+    assert median([3, 1, 2]) == 2
+    assert median([4, 1, 2, 3]) == 2.5
+
+
+def test_history_window(tmp_path):
+    history = ExecutionHistory(str(tmp_path / "history.jsonl"), window=2)
+    assert history.recent() == []
+    for build in range(3):
+        history.append(record("build-{}".format(build), notebook("a", 10.0 + build)))
+    with open(history.path, "a") as history_file:
+        history_file.write('{"build_id": "truncated"')
+
+    assert [item['build_id'] for item in history.recent()] == ["build-1", "build-2"]
+    assert [item['build_id'] for item in history.recent(exclude_build_id="build-2")] == ["build-0", "build-1"]
+    assert history.runtimes() == {"a": 11.5}
+
+
+def test_runtime_regression():
+    detector = TrendDetector(threshold=0.25, min_seconds=1.0)
+    history = [record("build-{}".format(build), notebook("a", 10.0, cells={"c1": 4.0}), notebook("b", 2.0))
+               for build in range(3)]
+
+    trends = detector.detect(record("latest", notebook("a", 15.0, cells={"c1": 9.0}), notebook("b", 2.4)), history)
+    assert trends['builds_compared'] == 3
+    assert [(item['filename'], item['baseline']) for item in trends['runtime_regressions']] == [("a", 10.0)]
+    assert [(item['source_hash'], item['runtime']) for item in trends['cell_regressions']] == [("c1", 9.0)]
+
+    ## b is 20% slower and a is slower by less than min_seconds
+    trends = detector.detect(record("latest", notebook("a", 10.9), notebook("b", 2.4)), history)
+    assert trends['runtime_regressions'] == []
+
+
+def test_new_failure():
+    detector = TrendDetector(threshold=0.25, min_seconds=1.0)
+    history = [record("build-0", notebook("a", 1.0)), record("build-1", notebook("a", 1.0))]
+
+    trends = detector.detect(record("latest", notebook("a", 1.0, num_errors=2), notebook("new", 1.0, num_errors=1)), history)
+    assert [(item['filename'], item['num_errors']) for item in trends['new_failures']] == [("a", 2)]
+    assert trends['flaky'] == []
+
+
+def test_flaky():
+    detector = TrendDetector(threshold=0.25, min_seconds=1.0)
+    history = [record("build-0", notebook("a", 1.0), notebook("b", 1.0)),
+               record("build-1", notebook("a", 1.0, num_errors=1), notebook("b", 1.0)),
+               record("build-2", notebook("a", 1.0), notebook("b", 1.0, num_errors=1))]
+
+    trends = detector.detect(record("latest", notebook("a", 1.0), notebook("b", 1.0, num_errors=1)), history)
+    assert [(item['filename'], item['failures'], item['runs']) for item in trends['flaky']] == [("a", 1, 4)]
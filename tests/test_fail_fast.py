@@ -0,0 +1,72 @@
+"""
+Early abort of the execution of the notebooks by FailFast
+"""
+
+from types import SimpleNamespace
+from nbformat.v4 import new_notebook, new_code_cell, new_output
+from sphinxcontrib.jupyter.writers.fail_fast import FailFast, failure_signature
+
+
+def fail_fast(threshold=None, sample=None):
+    config = {"jupyter_execute_fail_fast": threshold, "jupyter_execute_sample": sample}
+    return FailFast(SimpleNamespace(config=config))
+
+
+def test_failure_signature():
+    error = SimpleNamespace(ename="ModuleNotFoundError", evalue="No module named 'x'")
+    assert failure_signature(error, None) == "ModuleNotFoundError: No module named 'x'"
+
+    nb = new_notebook(cells=[new_code_cell("import x", outputs=[
+        new_output("error", ename="ModuleNotFoundError", evalue="No module named 'x'", traceback=[])])])
+    assert failure_signature(None, nb) == "ModuleNotFoundError: No module named 'x'"
+    assert failure_signature(None, new_notebook(cells=[new_code_cell("1")])) is None
+
+
+def test_trips_on_the_same_failure():
+    ff = fail_fast(threshold=3)
+    assert not ff.record("a", "ImportError: x")
+    assert not ff.record("b", "ValueError: y")
+    assert not ff.record("c", None)
+    assert not ff.record("d", "ImportError: x")
+    assert ff.aborted is None
+    assert ff.record("e", "ImportError: x")
+    assert ff.aborted == "ImportError: x"
+
+
+def test_counts_distinct_notebooks_per_target():
+    ff = fail_fast(threshold=3)
+    ff.record("a", "ImportError: x")
+    ff.record("b", "ImportError: x")
+    ## the same notebook collected again does not count twice
+    assert not ff.record("a", "ImportError: x")
+
+    ## the notebooks of the next target are counted from scratch
+    ff.reset()
+    assert not ff.record("a", "ImportError: x")
+    assert not ff.record("b", "ImportError: x")
+    assert ff.record("c", "ImportError: x")
+
+
+def test_sample_failed():
+    ff = fail_fast(sample=2)
+    ff.record("a", "ImportError: x")
+    ff.record("b", None)
+    assert not ff.sample_failed()
+
+    ff.reset()
+    ff.record("a", "ImportError: x")
+    ff.record("b", "ValueError: y")
+    assert ff.sample_failed()
+    assert ff.aborted in ("ImportError: x", "ValueError: y")
+
+
+def test_hold():
+    ff = fail_fast(sample=2)
+    futures = []
+    params = {'futures': futures, 'held_notebooks': []}
+    assert not ff.hold(params, futures)
+    futures.extend(["a", "b"])
+    assert ff.hold(params, futures)
+    ## delayed notebooks and notebooks submitted while collecting are not held
+    assert not ff.hold(params, [])
+    assert not ff.hold(dict(params, held_notebooks=None), futures)
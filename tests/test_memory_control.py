@@ -0,0 +1,84 @@
+"""
+Admission of the executions by MemoryGate and the memory estimates of the notebooks
+"""
+
+import json
+import threading
+import pytest
+from types import SimpleNamespace
+from sphinxcontrib.jupyter.writers import memory_control
+from sphinxcontrib.jupyter.writers.memory_control import MemoryGate, MemoryEstimates
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    ## only the budget decides, whatever the memory available on this machine
+    monkeypatch.setattr(memory_control, "psutil", None)
+    gate = MemoryGate()
+    gate.poll_interval = 0.01
+    return gate
+
+
+def test_without_budget(gate):
+    with gate.admit(10**12):
+        with gate.admit(10**12):
+            assert gate.running == 0
+
+
+def test_admit_and_release(gate):
+    gate.configure(100)
+    with gate.admit(40):
+        with gate.admit(60):
+            assert (gate.reserved, gate.running) == (100, 2)
+        assert (gate.reserved, gate.running) == (40, 1)
+    assert (gate.reserved, gate.running) == (0, 0)
+
+    ## a notebook estimated above the budget runs on its own
+    assert gate.has_headroom(1000)
+    with pytest.raises(ValueError):
+        with gate.admit(1000):
+            assert gate.running == 1
+            raise ValueError()
+    assert (gate.reserved, gate.running) == (0, 0)
+
+
+def test_waits_until_release(gate):
+    gate.configure(100)
+    admitted = threading.Event()
+    release = threading.Event()
+
+    def execute():
+        with gate.admit(60):
+            admitted.set()
+            release.wait(10)
+
+    def waiting():
+        with gate.admit(60):
+            order.append("waiting")
+
+    order = []
+    first = threading.Thread(target=execute)
+    first.start()
+    assert admitted.wait(10)
+    second = threading.Thread(target=waiting)
+    second.start()
+    second.join(0.2)
+    assert second.is_alive()
+
+    order.append("released")
+    release.set()
+    first.join(10)
+    second.join(10)
+    assert order == ["released", "waiting"]
+    assert (gate.reserved, gate.running) == (0, 0)
+
+
+def test_estimates(tmp_path):
+    with open(str(tmp_path / "execution-history.jsonl"), "w") as history_file:
+        for peak_rss in (100, 300, None):
+            history_file.write(json.dumps({'build_id': "", 'run_time': "", 'notebooks': [
+                {'filename': "a", 'runtime': 1.0, 'num_errors': 0, 'peak_rss': peak_rss}]}) + "\n")
+    config = {"jupyter_execute_memory_limit": 50, "jupyter_coverage_dir": None, "jupyter_coverage_history_window": 10}
+    estimates = MemoryEstimates(SimpleNamespace(config=config, reportdir=str(tmp_path) + "/"))
+    assert estimates.estimate("a") == 300
+    assert estimates.estimate("b") == 50
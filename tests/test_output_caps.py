@@ -0,0 +1,61 @@
+"""
+Output limits of InstrumentedExecutePreprocessor, checked against a python kernel
+
+Run with ``python -m pytest tests``
+"""
+
+import pytest
+from nbformat.v4 import new_notebook, new_code_cell
+from sphinxcontrib.jupyter.writers.execute_preprocessor import InstrumentedExecutePreprocessor
+
+jupyter_client = pytest.importorskip("jupyter_client.kernelspec")
+
+
+def execute(source, **limits):
+    try:
+        jupyter_client.KernelSpecManager().get_kernel_spec("python3")
+    except jupyter_client.NoSuchKernel:
+        pytest.skip("no python3 kernel")
+    nb = new_notebook(cells=[new_code_cell(source)])
+    nb.metadata.kernelspec = {"name": "python3", "display_name": "Python", "language": "python"}
+    ep = InstrumentedExecutePreprocessor(timeout=60, kernel_name="python3", **limits)
+    resources = {"metadata": {"path": ".", "filename_with_path": "test"}}
+    nb, resources = ep.execute(nb, resources)
+    assert 'execution_error' not in resources
+    return nb.cells[0].outputs, resources['execution_stats']['cells'][0]
+
+
+def test_stream_loop_counts_as_one_output():
+    outputs, stats = execute("for i in range(30):\n    print(i, flush=True)", max_outputs_per_cell=3)
+    assert len(outputs) == 1
+    assert outputs[0]['text'] == "".join("{}\n".format(i) for i in range(30))
+    assert not stats['truncated']
+
+
+def test_outputs_beyond_the_limit_are_dropped():
+    outputs, stats = execute("for i in range(30):\n    display(i)", max_outputs_per_cell=3)
+    assert len(outputs) == 4
+    assert outputs[-1]['text'] == "[... 27 further outputs omitted ...]\n"
+    assert stats['truncated']
+
+
+def test_interleaved_streams_and_displays_are_capped():
+    outputs, stats = execute("for i in range(30):\n    print(i, flush=True)\n    display(i)", max_outputs_per_cell=3)
+    assert len(outputs) == 4
+    assert stats['truncated']
+
+
+def test_stream_bytes_are_truncated():
+    outputs, stats = execute("print('a' * 1000)", max_stream_output_bytes=100)
+    assert outputs[0]['text'].startswith("a" * 100 + "\n[... stream output truncated after 100 bytes ...]")
+    assert stats['truncated']
+
+
+def test_large_images_are_omitted():
+    source = ("from IPython.display import Image\n"
+              "import base64\n"
+              "Image(data=base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='))")
+    outputs, stats = execute(source, max_image_output_bytes=10)
+    assert 'image/png' not in outputs[0]['data']
+    assert outputs[0]['data']['text/plain'].startswith("[image/png output of")
+    assert stats['truncated']
@@ -0,0 +1,67 @@
+"""
+Progress of the execution of the notebooks reported by ExecutionProgress
+"""
+
+import json
+import pytest
+from types import SimpleNamespace
+from sphinxcontrib.jupyter.writers.progress import ExecutionProgress, format_duration, running_executions
+
+
+def builder(tmp_path, n_workers=2):
+    config = {"jupyter_execute_progress_interval": 1, "jupyter_coverage_dir": None,
+              "jupyter_coverage_history_window": 10}
+    return SimpleNamespace(config=config, reportdir=str(tmp_path) + "/", n_workers=n_workers, threads_per_worker=1)
+
+
+def write_history(tmp_path, runtimes):
+    with open(str(tmp_path / "execution-history.jsonl"), "w") as history_file:
+        history_file.write(json.dumps({'build_id': "", 'run_time': "", 'notebooks': [
+            {'filename': filename, 'runtime': runtime, 'num_errors': 0, 'peak_rss': None}
+            for filename, runtime in runtimes.items()]}) + "\n")
+
+
+def test_format_duration():
+    assert format_duration(None) == "unknown"
+    assert format_duration(3725.9) == "1:02:05"
+
+
+def test_running_executions():
+    with running_executions.track("a"):
+        assert "a" in running_executions.snapshot()
+    assert "a" not in running_executions.snapshot()
+
+
+def test_status(tmp_path):
+    write_history(tmp_path, {"a": 10.0, "b": 20.0})
+    progress = ExecutionProgress(builder(tmp_path), "website", ["a", "b", "c"])
+    progress.collected("a", 12.0)
+    with running_executions.track("b"), running_executions.track("other-target"):
+        status = progress.status("running")
+
+    assert (status['target'], status['state'], status['total'], status['done'], status['queued']) == (
+        "website", "running", 3, 1, 1)
+    assert [(item['filename'], item['estimate']) for item in status['running']] == [("b", 20.0)]
+    ## c is estimated with the mean of the known runtimes, (10 + 20 + 12) / 3, over two workers
+    assert status['eta'] == pytest.approx((14.0 + 20.0) / 2, abs=0.1)
+
+
+def test_status_without_runtimes(tmp_path):
+    progress = ExecutionProgress(builder(tmp_path), "website", ["a"])
+    assert progress.status("running")['eta'] is None
+
+
+def test_status_file_per_target(tmp_path):
+    website = ExecutionProgress(builder(tmp_path), "website", ["a", "b"])
+    pdf = ExecutionProgress(builder(tmp_path), "pdf", ["a"])
+    website.collected("a", 1.0)
+    website.report()
+    pdf.report(state="finished")
+
+    with open(str(tmp_path / "execution-status-website.json")) as status_file:
+        status = json.load(status_file)
+    assert (status['target'], status['state'], status['done'], status['queued']) == ("website", "running", 1, 1)
+    with open(str(tmp_path / "execution-status-pdf.json")) as status_file:
+        status = json.load(status_file)
+    assert (status['target'], status['state'], status['done'], status['queued']) == ("pdf", "finished", 0, 1)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["execution-status-pdf.json", "execution-status-website.json"]
@@ -0,0 +1,64 @@
+"""
+ExecutionResultsStore and the JSON file of the latest results
+"""
+
+import json
+from sphinxcontrib.jupyter.writers.results_store import ExecutionResultsStore, format_runtime, parse_runtime
+
+
+def result(filename, runtime, num_errors=0, retries=0):
+    return {'filename': filename, 'runtime': runtime, 'num_errors': num_errors, 'output_bytes': 100,
+            'extension': 'py', 'language': 'python', 'retries': retries}
+
+
+def test_runtime_format():
+    assert format_runtime(5.25) == "0:05.2"
+    assert format_runtime(75.0) == "1:15.0"
+    assert parse_runtime("1:15.0") == 75.0
+    assert parse_runtime(format_runtime(3723.4)) == 3723.4
+
+
+def test_latest_results(tmp_path):
+    store = ExecutionResultsStore(str(tmp_path / "results.sqlite"))
+    assert store.is_empty()
+    store.upsert("build-1", "01-01-2026 10:00:00", [result("a", 10.0), result("b", 20.0, num_errors=1)])
+    store.upsert("build-2", "02-01-2026 10:00:00", [result("a", 12.0, retries=1)])
+
+    results, run_time = store.latest_results()
+    assert run_time == "02-01-2026 10:00:00"
+    assert [(item['filename'], item['build_id'], item['runtime']) for item in results] == [
+        ("a", "build-2", 12.0), ("b", "build-1", 20.0)]
+    assert [item['runtime'] for item in store.history("a")] == [10.0, 12.0]
+
+
+def test_json_round_trip(tmp_path):
+    json_filename = str(tmp_path / "code-execution-results.json")
+    store = ExecutionResultsStore(str(tmp_path / "results.sqlite"))
+    store.upsert("build-1", "01-01-2026 10:00:00", [result("a", 75.04), result("b", 5.25, num_errors=2, retries=1)])
+    store.export_json(json_filename)
+
+    with open(json_filename) as json_file:
+        exported = json.load(json_file)
+    assert exported['run_time'] == "01-01-2026 10:00:00"
+    assert [(item['filename'], item['runtime'], item['num_errors'], item['retries']) for item in exported['results']] == [
+        ("a", "1:15.0", 0, 0), ("b", "0:05.2", 2, 1)]
+
+    imported = ExecutionResultsStore(str(tmp_path / "imported.sqlite"))
+    imported.import_json(json_filename, "imported")
+    imported.export_json(str(tmp_path / "reexported.json"))
+    with open(str(tmp_path / "reexported.json")) as json_file:
+        assert json.load(json_file) == exported
+
+
+def test_import_json_without_retries(tmp_path):
+    ## files exported before the output bytes and retries were recorded
+    json_filename = str(tmp_path / "old.json")
+    with open(json_filename, "w") as json_file:
+        json.dump({'run_time': "01-01-2026 10:00:00", 'results': [
+            {'filename': "a", 'runtime': "0:10.0", 'num_errors': 0, 'extension': "py", 'language': "python"}]}, json_file)
+    store = ExecutionResultsStore(str(tmp_path / "results.sqlite"))
+    store.import_json(json_filename, "imported")
+    results, run_time = store.latest_results()
+    assert results[0]['runtime'] == 10.0
+    assert results[0]['retries'] == 0
+    assert results[0]['output_bytes'] is None
@@ -0,0 +1,80 @@
+"""
+Retries of the notebooks failing on the kernel infrastructure in InstrumentedExecutePreprocessor
+"""
+
+import errno
+import zmq
+from nbclient.exceptions import CellExecutionError, CellTimeoutError, DeadKernelError
+from nbformat.v4 import new_notebook, new_code_cell
+from sphinxcontrib.jupyter.writers.execute_preprocessor import InstrumentedExecutePreprocessor, infrastructure_failure
+from sphinxcontrib.jupyter.writers.memory_control import MemoryLimitExceeded
+
+
+class FailingPreprocessor(InstrumentedExecutePreprocessor):
+    """
+    Raises the errors of `failures` in turn, then executes nothing
+    """
+    def __init__(self, failures, **kw):
+        super(FailingPreprocessor, self).__init__(**kw)
+        self.failures = list(failures)
+        self.attempts = 0
+
+    def preprocess(self, nb, resources=None, km=None):
+        self.attempts += 1
+        nb.cells[0].outputs.append({'output_type': "stream", 'name': "stdout", 'text': "partial"})
+        if self.failures:
+            err = self.failures.pop(0)
+            err.execution_stats = {'runtime': 0.5}
+            raise err
+        resources['execution_stats'] = {'runtime': 1.0}
+        return nb, resources
+
+
+def execute(ep):
+    return ep.execute(new_notebook(cells=[new_code_cell("1")]), {'metadata': {'filename_with_path': "test"}})
+
+
+def test_infrastructure_failure():
+    assert infrastructure_failure(DeadKernelError("Kernel died"))
+    assert infrastructure_failure(zmq.ZMQError())
+    assert infrastructure_failure(ConnectionResetError())
+    assert infrastructure_failure(TimeoutError())
+    assert infrastructure_failure(OSError(errno.EADDRINUSE, "Address already in use"))
+    assert infrastructure_failure(RuntimeError("Kernel didn't respond in 60 seconds"))
+
+    ## failures of the code of the notebook are not retried
+    assert not infrastructure_failure(CellExecutionError("traceback", "ValueError", "bad value"))
+    assert not infrastructure_failure(CellTimeoutError("Cell execution timed out"))
+    assert not infrastructure_failure(OSError(errno.ENOENT, "No such file"))
+    assert not infrastructure_failure(RuntimeError("something else"))
+    assert not infrastructure_failure(MemoryLimitExceeded(2048, 1024))
+    assert not infrastructure_failure(ValueError())
+
+
+def test_retried_until_success():
+    ep = FailingPreprocessor([DeadKernelError("Kernel died"), zmq.ZMQError()], retries=2, retry_backoff=0.01)
+    nb, resources = execute(ep)
+    assert ep.attempts == 3
+    assert 'execution_error' not in resources
+    assert [item['backoff'] for item in resources['execution_retries']] == [0.01, 0.02]
+    assert resources['execution_retries'][0]['error'] == "DeadKernelError: Kernel died"
+    ## every attempt starts from the unexecuted notebook
+    assert len(nb.cells[0].outputs) == 1
+
+
+def test_retries_exhausted():
+    ep = FailingPreprocessor([DeadKernelError("Kernel died")] * 3, retries=1, retry_backoff=0.01)
+    nb, resources = execute(ep)
+    assert ep.attempts == 2
+    assert isinstance(resources['execution_error'], DeadKernelError)
+    assert len(resources['execution_retries']) == 1
+
+
+def test_notebook_errors_are_not_retried():
+    error = CellExecutionError("traceback", "ValueError", "bad value")
+    ep = FailingPreprocessor([error], retries=2, retry_backoff=0.01)
+    nb, resources = execute(ep)
+    assert ep.attempts == 1
+    assert resources['execution_error'] is error
+    assert resources['execution_stats'] == {'runtime': 0.5}
+    assert 'execution_retries' not in resources